@@ -0,0 +1 @@
+"""Offline benchmarks and stress checks for the travel planner graph."""
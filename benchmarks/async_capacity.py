@@ -0,0 +1,64 @@
+"""How many concurrent plans one process sustains, with sync vs async graph nodes.
+
+Runs N plans at once in one event loop (like the Streamlit server or the batch runner),
+through the orchestrator built with sync nodes (model calls block a worker thread each)
+and with async nodes (model calls are awaited). The fake models and searches wait
+`--llm-latency` / `--search-latency` seconds like network calls, so with perfect
+interleaving every N finishes in about the time of a single plan, until the graph's own
+CPU time (the "cpu" column) becomes the limit.
+
+    python -m benchmarks.async_capacity
+    python -m benchmarks.async_capacity --sessions 16 64 256 --llm-latency 0.5
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import statistics
+import time
+
+from benchmarks.fakes import install_fakes
+from benchmarks.graph import initial_state
+
+from travel_planner.agents.orchestrator import build_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+
+
+async def run_plans(app, sessions: int) -> list[float]:
+    async def plan(session: int) -> float:
+        start = time.perf_counter()
+        await app.ainvoke(initial_state(session), config=budget_config())
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(plan(session) for session in range(sessions)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--research-calls", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.2)
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.llm_latency, search_latency=args.search_latency, research_calls=args.research_calls)
+    set_research_cache(None)
+    apps = {
+        "sync nodes": build_orchestrator(async_nodes=False).compile(),
+        "async nodes": build_orchestrator(async_nodes=True).compile(),
+    }
+    for sessions in args.sessions:
+        for name, app in apps.items():
+            start, cpu_start = time.perf_counter(), time.process_time()
+            with contextlib.redirect_stdout(io.StringIO()):
+                latencies = sorted(asyncio.run(run_plans(app, sessions)))
+            wall_time, cpu_time = time.perf_counter() - start, time.process_time() - cpu_start
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            print(f"{sessions:4} plans  {name:12} {wall_time:6.2f}s (cpu {cpu_time:6.2f}s)  {sessions / wall_time:6.1f} plans/s  "
+                  f"latency mean {statistics.mean(latencies):5.2f}s p95 {p95:5.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Stress check: concurrent plans in one process must not leak events into each other.
+
+Runs N plans against the fake models, once with threads calling `invoke` and once
+with `astream_events` on one event loop. Every run gets its own callback handler and
+its own destination; a run's handler (and event stream) must only ever see its own
+destination. A leak fails the check with exit status 1, so it can run in CI:
+
+    python -m benchmarks.concurrent_sessions --runs 16
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import install_fakes
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from travel_planner.agents.orchestrator import orchestrator_builder
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+
+# call_researcher x2, tavily_search x2, call_planner
+TOOL_RUNS_PER_PLAN = 5
+
+
+class IsolationError(Exception):
+    """A run saw events of another run, or not all of its own."""
+
+
+class RecordingHandler(BaseCallbackHandler):
+    def __init__(self):
+        self.tool_inputs = []
+
+    def on_tool_start(self, serialized, input_str, **kwargs):
+        self.tool_inputs.append(input_str)
+
+
+def initial_state(destination: str) -> dict:
+    return {
+        "messages": [HumanMessage(content="Plan my trip")],
+        "home_city": "Munich",
+        "destination_city": destination,
+        "start_date": "2026-02-01",
+        "end_date": "2026-02-03",
+        "budget": 2000.0,
+    }
+
+
+def check(destination: str, destinations: list[str], seen: list[str], label: str):
+    foreign = [text for text in seen if any(d in text for d in destinations if d != destination)]
+    if foreign:
+        raise IsolationError(f"{label} for {destination} received events of other runs: {foreign}")
+    if len(seen) != TOOL_RUNS_PER_PLAN:
+        raise IsolationError(f"{label} for {destination} saw {len(seen)} tool runs, expected {TOOL_RUNS_PER_PLAN}")
+
+
+def run_sync(app, destinations: list[str]):
+    def run(destination):
+        handler = RecordingHandler()
+        app.invoke(initial_state(destination), config=budget_config({"callbacks": [handler]}))
+        return handler
+
+    with ThreadPoolExecutor(max_workers=len(destinations)) as executor:
+        handlers = list(executor.map(run, destinations))
+    for destination, handler in zip(destinations, handlers):
+        check(destination, destinations, handler.tool_inputs, "invoke callbacks")
+
+
+async def run_async(app, destinations: list[str]):
+    async def run(destination):
+        handler = RecordingHandler()
+        streamed = []
+        async for event in app.astream_events(initial_state(destination), config=budget_config({"callbacks": [handler]}), version="v2"):
+            if event["event"] == "on_tool_start":
+                streamed.append(str(event["data"].get("input")))
+        return handler, streamed
+
+    results = await asyncio.gather(*(run(destination) for destination in destinations))
+    for destination, (handler, streamed) in zip(destinations, results):
+        check(destination, destinations, handler.tool_inputs, "astream_events callbacks")
+        check(destination, destinations, streamed, "astream_events stream")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0.01, help="Fake model and search latency in seconds")
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.latency, search_latency=args.latency)
+    # Every run has to do its own research, otherwise there is nothing to leak
+    set_research_cache(None)
+    app = orchestrator_builder.compile()
+    destinations = [f"City-{i:03d}" for i in range(args.runs)]
+
+    try:
+        start = time.perf_counter()
+        run_sync(app, destinations)
+        sync_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        asyncio.run(run_async(app, destinations))
+        async_time = time.perf_counter() - start
+    except IsolationError as error:
+        print(f"FAILED: {error}", file=sys.stderr)
+        sys.exit(1)
+
+    print(f"{args.runs} concurrent plans isolated: invoke {sync_time:.2f}s, astream_events {async_time:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
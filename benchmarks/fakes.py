@@ -0,0 +1,190 @@
+"""Deterministic stand-ins for the Anthropic models and the Tavily search tool."""
+
+import asyncio
+import json
+import os
+import re
+import time
+from typing import Callable, Optional
+
+# Nothing here calls the providers, but their clients refuse to be built without a key
+os.environ.setdefault("ANTHROPIC_API_KEY", "offline")
+os.environ.setdefault("TAVILY_API_KEY", "offline")
+# Measure the graph, not SQLite or cached plans, unless a benchmark asks for them
+os.environ.setdefault("TRAVEL_PLANNER_CHECKPOINTS", "off")
+os.environ.setdefault("TRAVEL_PLANNER_PLAN_CACHE", "off")
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import StructuredTool
+
+from travel_planner.cache import categorize
+from travel_planner.components import Components, set_components
+from travel_planner.scheduler import ScheduledChatModel
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model whose answer is computed by `respond` from the input messages.
+
+    Being a pure function of its input, one instance can be shared by concurrent runs.
+    `latency` is spent before the first token, `token_latency` between streamed tokens.
+    Responses carry approximate usage_metadata, like the real provider's.
+    """
+
+    respond: Callable[[list[BaseMessage]], AIMessage]
+    latency: float = 0.0
+    token_latency: float = 0.0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _respond(self, messages: list[BaseMessage]) -> AIMessage:
+        message = self.respond(messages)
+        input_tokens = count_tokens_approximately(messages)
+        output_tokens = count_tokens_approximately([message])
+        message.usage_metadata = {
+            "input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens,
+        }
+        return message
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages))])
+
+    def _chunks(self, message: AIMessage):
+        for token in re.split(r"(?<=\s)", message.content):
+            if token:
+                yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+        # Tool calls and usage arrive with the last chunk, as with Anthropic
+        yield ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": index}
+                for index, call in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        ))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(self.latency)
+        for chunk in self._chunks(self._respond(messages)):
+            if chunk.message.content:
+                time.sleep(self.token_latency)
+                if run_manager:
+                    run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(self.latency)
+        for chunk in self._chunks(self._respond(messages)):
+            if chunk.message.content:
+                await asyncio.sleep(self.token_latency)
+                if run_manager:
+                    await run_manager.on_llm_new_token(chunk.message.content, chunk=chunk)
+            yield chunk
+
+
+def _destination(messages: list[BaseMessage]) -> str:
+    match = re.search(r"- To: (.*)", messages[0].text)
+    return match.group(1).strip() if match else "somewhere"
+
+
+RESEARCH_TOPICS = ["Flights to", "Hotels in", "Weather in", "Visa rules for", "Events in", "Restaurants in", "Transport in", "Museums in"]
+
+
+def make_orchestrator_respond(research_calls: int = 2, per_turn: Optional[int] = None):
+    """Ask the researcher `research_calls` questions, `per_turn` (default: all) per turn, then
+    hand over to the planner. Topics whose category was already researched (e.g. by the
+    prefetch stage) are left out, like the real orchestrator would."""
+
+    def orchestrator_respond(messages: list[BaseMessage]) -> AIMessage:
+        destination = _destination(messages)
+        asked = [tc["args"]["question"] for m in messages if m.type == "ai" for tc in m.tool_calls
+                 if tc["name"] == "call_researcher"]
+        covered = {categorize(question) for question in asked}
+        questions = [f"{RESEARCH_TOPICS[i % len(RESEARCH_TOPICS)]} {destination} #{i}" for i in range(research_calls)]
+        questions = [question for question in questions if question not in asked and categorize(question) not in covered]
+        if questions:
+            turn = sum(1 for m in messages if m.type == "ai" and m.tool_calls)
+            return AIMessage(
+                content=f"I will research the trip to {destination}.",
+                tool_calls=[
+                    {"name": "call_researcher", "args": {"question": question}, "id": f"research-{turn}-{i}-{destination}"}
+                    for i, question in enumerate(questions[:per_turn or research_calls])
+                ],
+            )
+        return AIMessage(content="", tool_calls=[{"name": "call_planner", "args": {}, "id": f"planner-{destination}"}])
+
+    return orchestrator_respond
+
+
+def make_researcher_respond(searches: int = 1):
+    """Search `searches` times for the question, then answer with the search results."""
+
+    def researcher_respond(messages: list[BaseMessage]) -> AIMessage:
+        question = next(m.text for m in messages if m.type == "human")
+        results = [m.text for m in messages if m.type == "tool"]
+        if len(results) >= searches:
+            return AIMessage(content="## Findings\n" + "\n".join(f"- {result}" for result in results))
+        query = f"{question} (part {len(results) + 1})" if searches > 1 else question
+        return AIMessage(content="", tool_calls=[{"name": "tavily_search", "args": {"query": query}, "id": f"search-{len(results)}-{question}"}])
+
+    return researcher_respond
+
+
+def make_planner_respond(days: int = 3):
+    """Write a plan with one section per day after the collected findings."""
+
+    def planner_respond(messages: list[BaseMessage]) -> AIMessage:
+        # Research arrives as tool results, or as the compacted brief in one human message
+        findings = [m.text for m in messages if m.type in ("tool", "human") and "## Findings" in m.text]
+        itinerary = [
+            f"## Day {day}\n\n**Morning:** Breakfast and a walk.\n**Afternoon:** Sightseeing.\n**Evening:** Dinner."
+            for day in range(1, days + 1)
+        ]
+        return AIMessage(content="# Your Travel Plan\n\n" + "\n\n".join(findings + itinerary))
+
+    return planner_respond
+
+
+def make_search_tool(latency: float = 0.0):
+    def tavily_search(query: str) -> str:
+        """Search the web."""
+        time.sleep(latency)
+        return f"Top result for: {query}"
+
+    async def atavily_search(query: str) -> str:
+        await asyncio.sleep(latency)
+        return f"Top result for: {query}"
+
+    return StructuredTool.from_function(func=tavily_search, coroutine=atavily_search)
+
+
+def install_fakes(llm_latency: float = 0.0, search_latency: float = 0.0, token_latency: float = 0.0,
+                  research_calls: int = 2, searches: int = 1, plan_days: int = 3, per_turn: Optional[int] = None) -> Components:
+    """Make the process-wide components the fakes, the real clients are never built."""
+    # Wrapped like the real models, so calls still go through the shared scheduler
+    components = Components(
+        orchestrator_model=ScheduledChatModel(model=FakeChatModel(
+            respond=make_orchestrator_respond(research_calls, per_turn), latency=llm_latency, token_latency=token_latency,
+        )),
+        researcher_model=ScheduledChatModel(model=FakeChatModel(
+            respond=make_researcher_respond(searches), latency=llm_latency, token_latency=token_latency,
+        )),
+        search_tool=make_search_tool(search_latency),
+        planner_model=ScheduledChatModel(model=FakeChatModel(
+            respond=make_planner_respond(plan_days), latency=llm_latency, token_latency=token_latency,
+        )),
+    )
+    set_components(components)
+    return components
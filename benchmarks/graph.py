@@ -0,0 +1,201 @@
+"""Offline benchmark of the orchestrator graph with scripted fake models.
+
+Every scenario runs the compiled graph through `invoke` and through `astream_events`
+(progress.stream_progress into the UI's ProgressTracker, like app.py does) and reports wall time, mean
+per-node latency, event throughput and peak traced memory. "agent" and "tools" are
+the nodes of the researcher's ReAct loop. With the default zero model latency the
+numbers are pure graph and event loop overhead.
+
+    python -m benchmarks.graph
+    python -m benchmarks.graph --scenario concurrent --llm-latency 0.05 --json
+    python -m benchmarks.graph --checkpoints /tmp/checkpoints.sqlite  # incl. checkpoint writes
+    python -m benchmarks.graph --scenario sequential --llm-latency 0.2 --search-latency 0.2 --prefetch
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Optional
+
+from benchmarks.fakes import install_fakes
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.messages import HumanMessage
+from travel_planner.agents.orchestrator import get_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.persistence import new_thread_id, thread_config
+from travel_planner.progress import ProgressTracker, stream_progress
+
+
+@dataclass
+class Scenario:
+    name: str
+    research_calls: int = 1
+    searches: int = 1
+    plan_days: int = 3
+    sessions: int = 1
+    # Questions per orchestrator turn, default all in the first
+    per_turn: Optional[int] = None
+
+
+SCENARIOS = {
+    "single-research": Scenario("single-research", research_calls=1),
+    "ten-research": Scenario("ten-research", research_calls=10, searches=2),
+    "long-plan": Scenario("long-plan", research_calls=4, plan_days=30),
+    "concurrent": Scenario("concurrent", research_calls=4, sessions=8),
+    # One question per turn, like the real orchestrator often does
+    "sequential": Scenario("sequential", research_calls=5, per_turn=1),
+}
+
+
+class NodeTimer(BaseCallbackHandler):
+    """Collects the duration of every graph node run (chains named like their langgraph_node)."""
+
+    def __init__(self):
+        self.started = {}
+        self.durations = defaultdict(list)
+
+    def on_chain_start(self, serialized, inputs, *, run_id, metadata=None, **kwargs):
+        node = (metadata or {}).get("langgraph_node")
+        if node and kwargs.get("name") == node:
+            self.started[run_id] = (node, time.perf_counter())
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        if run_id in self.started:
+            node, start = self.started.pop(run_id)
+            self.durations[node].append(time.perf_counter() - start)
+
+
+@dataclass
+class Result:
+    scenario: str
+    mode: str
+    wall_time: float
+    peak_memory_mb: float
+    events: int = 0
+    node_latency_ms: dict = field(default_factory=dict)
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.wall_time if self.wall_time else 0.0
+
+
+def initial_state(session: int) -> dict:
+    return {
+        "messages": [HumanMessage(content="Plan my trip")],
+        "home_city": "Munich",
+        "destination_city": f"Tokyo-{session}",
+        "start_date": "2026-02-01",
+        "end_date": "2026-02-08",
+        "budget": 3000.0,
+    }
+
+
+def measure(scenario: Scenario, mode: str, run) -> Result:
+    timer = NodeTimer()
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = run(timer)
+    wall_time = time.perf_counter() - start
+
+    # tracemalloc slows everything down, so memory gets a separate run
+    tracemalloc.start()
+    with contextlib.redirect_stdout(io.StringIO()):
+        run(NodeTimer())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return Result(
+        scenario=scenario.name,
+        mode=mode,
+        wall_time=wall_time,
+        peak_memory_mb=peak / 2**20,
+        events=events,
+        node_latency_ms={node: 1000 * sum(d) / len(d) for node, d in sorted(timer.durations.items())},
+    )
+
+
+def run_config(timer: NodeTimer, prefetch: bool) -> dict:
+    config = thread_config(new_thread_id())
+    config["configurable"]["prefetch"] = prefetch
+    return budget_config({**config, "callbacks": [timer]})
+
+
+def run_invoke(app, scenario: Scenario, timer: NodeTimer, prefetch: bool = False) -> int:
+    def plan(session):
+        app.invoke(initial_state(session), config=run_config(timer, prefetch))
+
+    with ThreadPoolExecutor(max_workers=scenario.sessions) as executor:
+        list(executor.map(plan, range(scenario.sessions)))
+    return 0
+
+
+def run_stream(app, scenario: Scenario, timer: NodeTimer, prefetch: bool = False) -> int:
+    async def plan(session):
+        tracker = ProgressTracker()
+        count = 0
+        config = run_config(timer, prefetch)
+        async for _ in stream_progress(app, initial_state(session), config, tracker):
+            count += 1
+        assert tracker.final_plan, "no plan produced"
+        return count
+
+    async def plans():
+        return sum(await asyncio.gather(*(plan(session) for session in range(scenario.sessions))))
+
+    return asyncio.run(plans())
+
+
+def run_scenario(scenario: Scenario, args) -> list[Result]:
+    install_fakes(
+        llm_latency=args.llm_latency, search_latency=args.search_latency, token_latency=args.token_latency,
+        research_calls=scenario.research_calls, searches=scenario.searches, plan_days=scenario.plan_days,
+        per_turn=scenario.per_turn,
+    )
+    # Research must not be served from the cache of a previous run
+    set_research_cache(None)
+    app = get_orchestrator()
+    results = []
+    for prefetch in (False, True) if args.prefetch else (False,):
+        suffix = "+prefetch" if prefetch else ""
+        results += [
+            measure(scenario, "invoke" + suffix, lambda timer: run_invoke(app, scenario, timer, prefetch)),
+            measure(scenario, "astream_events" + suffix, lambda timer: run_stream(app, scenario, timer, prefetch)),
+        ]
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", choices=sorted(SCENARIOS), action="append", help="Default: all")
+    parser.add_argument("--llm-latency", type=float, default=0.0, help="Seconds before a fake model answers")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="Seconds between streamed tokens")
+    parser.add_argument("--search-latency", type=float, default=0.0, help="Seconds per fake search")
+    parser.add_argument("--checkpoints", default="off", help='"off" (default), "memory" or a SQLite path')
+    parser.add_argument("--prefetch", action="store_true", help="Also run every scenario with the prefetch stage")
+    parser.add_argument("--json", action="store_true", help="Print one JSON object per result")
+    args = parser.parse_args()
+    # Read when the graph is compiled
+    os.environ["TRAVEL_PLANNER_CHECKPOINTS"] = args.checkpoints
+
+    for name in args.scenario or SCENARIOS:
+        for result in run_scenario(SCENARIOS[name], args):
+            if args.json:
+                print(json.dumps({**result.__dict__, "events_per_second": result.events_per_second}))
+                continue
+            nodes = ", ".join(f"{node} {ms:.1f}" for node, ms in result.node_latency_ms.items())
+            throughput = f"{result.events} events, {result.events_per_second:,.0f}/s" if result.events else "-"
+            print(f"{result.scenario:16} {result.mode:24} {result.wall_time * 1000:8.1f} ms  "
+                  f"peak {result.peak_memory_mb:6.1f} MB  {throughput:24}  nodes (ms): {nodes}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Import time of the CLI and the agents, from `python -X importtime` in fresh interpreters.
+
+For each target the report shows the import's total time and its most expensive
+top-level packages. "first use" also builds every component (models, search tool,
+researcher agent), the work that is deferred until a plan actually runs.
+
+    python -m benchmarks.imports
+    python -m benchmarks.imports --runs 5 --top 8
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+TARGETS = {
+    "cli (--help)": "import sys; sys.argv = ['travel-planner', '--help']\n"
+                    "from travel_planner.main import main\n"
+                    "try:\n    main()\nexcept SystemExit:\n    pass",
+    "orchestrator": "import travel_planner.agents.orchestrator",
+    "server": "import travel_planner.server",
+    "first use": "from travel_planner.components import get_components\n"
+                 "import travel_planner.agents.orchestrator\n"
+                 "for name in ('model_with_tools', 'researcher', 'planner_model'):\n    get_components().get(name)",
+}
+
+LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| *(\S+)")
+
+
+def importtime(code: str) -> tuple[float, dict[str, float]]:
+    """(wall seconds, top-level package -> seconds spent importing its modules) of running `code`."""
+    env = {**os.environ, "ANTHROPIC_API_KEY": os.getenv("ANTHROPIC_API_KEY", "offline"),
+           "TAVILY_API_KEY": os.getenv("TAVILY_API_KEY", "offline")}
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", code], env=env,
+                            capture_output=True, text=True, check=True)
+    wall = time.perf_counter() - start
+    packages = defaultdict(float)
+    for match in LINE.finditer(result.stderr):
+        # Self time, so every module is counted once and under its own package
+        packages[match.group(3).split(".")[0]] += int(match.group(1)) / 1e6
+    return wall, packages
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=3, help="Interpreters per target, the median run is reported")
+    parser.add_argument("--top", type=int, default=5, help="Packages to list per target")
+    args = parser.parse_args()
+
+    for name, code in TARGETS.items():
+        runs = sorted((importtime(code) for _ in range(args.runs)), key=lambda run: sum(run[1].values()))
+        wall, packages = runs[len(runs) // 2]
+        total = sum(packages.values())
+        heaviest = sorted(packages.items(), key=lambda item: -item[1])[:args.top]
+        print(f"{name:<14} imports {total * 1000:7.0f} ms  process {wall * 1000:7.0f} ms  "
+              f"(imports of {args.runs} runs: {', '.join(f'{sum(r[1].values()) * 1000:.0f}' for r in runs)} ms)")
+        print("               " + ", ".join(f"{package} {seconds * 1000:.0f}" for package, seconds in heaviest))
+
+
+if __name__ == "__main__":
+    main()
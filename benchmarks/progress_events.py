@@ -0,0 +1,107 @@
+"""Events a plan streams to its frontend: all astream_events vs progress.stream_progress.
+
+Runs the same fake plans with the unfiltered astream_events (what app.py, the CLI and the
+server consumed before) and with stream_progress, which subscribes only to the events
+ProgressTracker reads. Both feed a ProgressTracker and an in-memory EventStore like the
+frontends do. The report shows the events per plan by kind, the stream's wall time, and
+checks that both trackers end with the same transcript (researcher calls with their
+searches, which run concurrently) and plan.
+
+    python -m benchmarks.progress_events
+    python -m benchmarks.progress_events --research-calls 8 --per-turn 4 --searches 3 --runs 10
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+from collections import Counter
+from dataclasses import asdict
+
+from benchmarks.fakes import install_fakes
+from benchmarks.graph import initial_state
+
+from travel_planner.agents.orchestrator import build_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.persistence import EventStore
+from travel_planner.progress import ProgressTracker, stream_progress
+
+
+def kind(event: dict) -> str:
+    node = event.get("metadata", {}).get("langgraph_node")
+    if event["event"] == "on_chat_model_stream":
+        return f"{node} tokens" if node in ("llm_call", "planner") else "researcher tokens"
+    if event["event"].startswith("on_chat_model"):
+        return "model runs"
+    if event["event"].startswith("on_tool"):
+        return "tool runs"
+    if event["event"] == "on_custom_event":
+        return "custom"
+    return "chain runs"
+
+
+async def all_events(app, state, tracker: ProgressTracker):
+    async for event in app.astream_events(state, budget_config(), version="v2"):
+        yield event, tracker.handle(event)
+
+
+async def progress_events(app, state, tracker: ProgressTracker):
+    async for progress in stream_progress(app, state, budget_config(), tracker=tracker):
+        yield progress.event, progress.updates
+
+
+async def run(app, stream, session: int, store: EventStore) -> tuple[Counter, int, ProgressTracker]:
+    """Events by kind, updates and the tracker of one plan."""
+    tracker = ProgressTracker()
+    kinds, updates = Counter(), 0
+    async for event, event_updates in stream(app, initial_state(session), tracker):
+        store.append(str(session), event)
+        kinds[kind(event)] += 1
+        updates += len(event_updates)
+    return kinds, updates, tracker
+
+
+def outcome(tracker: ProgressTracker) -> tuple:
+    return [asdict(item) | {"sub_steps": [(step.name, step.done) for step in item.sub_steps]} for item in tracker.items], tracker.final_plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--research-calls", type=int, default=6)
+    parser.add_argument("--per-turn", type=int, default=3, help="Researcher calls per orchestrator turn, run concurrently")
+    parser.add_argument("--searches", type=int, default=2, help="Searches per researcher call")
+    parser.add_argument("--plan-days", type=int, default=7)
+    parser.add_argument("--runs", type=int, default=5, help="Plans per stream, the mean is reported")
+    args = parser.parse_args()
+
+    install_fakes(research_calls=args.research_calls, per_turn=args.per_turn, searches=args.searches,
+                  plan_days=args.plan_days)
+    app = build_orchestrator().compile()
+    outcomes = {}
+    for name, stream in (("all events", all_events), ("stream_progress", progress_events)):
+        store = EventStore(":memory:")
+        kinds, updates, elapsed = Counter(), 0, 0.0
+        for session in range(args.runs):
+            # Every plan researches from scratch
+            set_research_cache(None)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                run_kinds, run_updates, tracker = asyncio.run(run(app, stream, session, store))
+            elapsed += time.perf_counter() - start
+            kinds += run_kinds
+            updates += run_updates
+            outcomes.setdefault(session, []).append(outcome(tracker))
+        stored = sum(len(store.events(str(session))) for session in range(args.runs))
+        total = sum(kinds.values())
+        print(f"{name:<16} {total / args.runs:6.0f} events/plan  {updates / args.runs:5.0f} updates/plan  "
+              f"{stored / args.runs:4.0f} stored/plan  {elapsed / args.runs * 1000:6.1f} ms/plan")
+        print(" " * 17 + ", ".join(f"{key} {count / args.runs:.0f}" for key, count in kinds.most_common()))
+
+    same = all(results[0] == results[1] for results in outcomes.values())
+    print(f"same transcript and plan: {'yes' if same else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
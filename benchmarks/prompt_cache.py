@@ -0,0 +1,199 @@
+"""Prompt-cache hits of a plan, offline (travel_planner/prompt_cache.py).
+
+All three agents run on `RecordingAnthropic`, a ChatAnthropic that builds the real request
+payload (tools, system blocks, messages with their cache_control) and records it instead
+of sending it. A simulation of Anthropic's prefix cache answers with the cache reads and
+writes the request would get, through the real response parsing. The plan runs with
+TRAVEL_PLANNER_PROMPT_CACHE on and off; the report shows the input tokens of every call,
+cached and uncached, and checks that each orchestrator request extends the previous one.
+
+    python -m benchmarks.prompt_cache
+    python -m benchmarks.prompt_cache --research-calls 6 --result-tokens 1500 --calls
+"""
+
+import argparse
+import asyncio
+import contextlib
+import hashlib
+import io
+import json
+import threading
+from typing import Any, Callable
+
+from benchmarks.fakes import make_orchestrator_respond, make_planner_respond, make_researcher_respond
+from benchmarks.graph import initial_state
+
+from anthropic.types import CacheCreation, Message, TextBlock, ToolUseBlock, Usage
+from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import AIMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.tools import StructuredTool
+from travel_planner.agents.orchestrator import build_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.components import Components, Settings, set_components
+from travel_planner.instrumentation import RunMetrics
+from travel_planner.scheduler import ScheduledChatModel, request_context
+
+# Price of cache writes and reads relative to uncached input tokens
+WRITE_PRICE = 1.25
+READ_PRICE = 0.1
+
+
+class PromptCacheSimulator:
+    """Anthropic's prefix cache: a breakpoint stores the prefix up to its block, a request
+    reads the longest stored prefix that ends at most `lookback` blocks before one of its
+    breakpoints. Prefixes shorter than `min_tokens` are never stored."""
+
+    def __init__(self, min_tokens: int = 1024, lookback: int = 20):
+        self.min_tokens = min_tokens
+        self.lookback = lookback
+        self.stored: set[str] = set()
+        # (stage, payload) of every request, in order
+        self.requests: list[tuple[str, dict]] = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def blocks(payload: dict) -> list[tuple[str, int, bool]]:
+        """(key, tokens, breakpoint) of every block in prefix order: tools, system, messages."""
+        blocks = [("tool", tool) for tool in payload.get("tools", [])]
+        system = payload.get("system") or []
+        blocks += [("system", block) for block in ([{"type": "text", "text": system}] if isinstance(system, str) else system)]
+        for message in payload["messages"]:
+            content = message["content"]
+            blocks += [(message["role"], block) for block in ([{"type": "text", "text": content}] if isinstance(content, str) else content)]
+        result = []
+        for role, block in blocks:
+            key = json.dumps([role, {k: v for k, v in block.items() if k != "cache_control"}], sort_keys=True, default=str)
+            result.append((key, max(1, len(key) // 4), "cache_control" in block))
+        return result
+
+    def request(self, stage: str, payload: dict) -> tuple[int, int, int]:
+        """(uncached, cache read, cache write) input tokens of a request."""
+        blocks = self.blocks(payload)
+        hashes, totals = [], []
+        digest, total = hashlib.sha256(), 0
+        for key, tokens, _ in blocks:
+            digest.update(key.encode())
+            total += tokens
+            hashes.append(digest.hexdigest())
+            totals.append(total)
+        breakpoints = [i for i, (_, _, marked) in enumerate(blocks) if marked]
+        with self._lock:
+            self.requests.append((stage, payload))
+            read = 0
+            for b in breakpoints:
+                for i in range(b, max(b - self.lookback, -1), -1):
+                    if hashes[i] in self.stored:
+                        read = max(read, totals[i])
+                        break
+            written = [totals[b] for b in breakpoints if totals[b] >= self.min_tokens]
+            self.stored.update(hashes[b] for b in breakpoints if totals[b] >= self.min_tokens)
+        write = max(max(written, default=0) - read, 0)
+        return totals[-1] - read - write if totals else 0, read, write
+
+
+class RecordingAnthropic(ChatAnthropic):
+    """ChatAnthropic that answers with `respond` and the simulated cache usage instead of calling the API."""
+
+    respond: Callable[[list], AIMessage]
+    simulator: Any
+
+    def _answer(self, messages, stop, run_manager, **kwargs):
+        payload = self._get_request_payload(messages, stop=stop, **kwargs)
+        stage = request_context(run_manager.metadata if run_manager else None)[0]
+        uncached, read, write = self.simulator.request(stage, payload)
+        message = self.respond(messages)
+        content = ([TextBlock(type="text", text=message.content)] if message.content else []) + [
+            ToolUseBlock(type="tool_use", id=call["id"], name=call["name"], input=call["args"]) for call in message.tool_calls
+        ]
+        return self._format_output(Message(
+            id="msg_offline", type="message", role="assistant", model=self.model, content=content,
+            stop_reason="tool_use" if message.tool_calls else "end_turn", stop_sequence=None,
+            usage=Usage(input_tokens=uncached, output_tokens=count_tokens_approximately([message]),
+                        cache_read_input_tokens=read, cache_creation_input_tokens=write,
+                        cache_creation=CacheCreation(ephemeral_5m_input_tokens=write, ephemeral_1h_input_tokens=0)),
+        ), **kwargs)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._answer(messages, stop, run_manager, **kwargs)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._answer(messages, stop, run_manager, **kwargs)
+
+
+def make_search_tool(result_tokens: int):
+    """Search results of about `result_tokens` tokens, like Tavily's five hits with content."""
+    def tavily_search(query: str) -> str:
+        """Search the web."""
+        lines = [f"- Result {i} for {query}: details, prices and opening hours of the place." for i in range(result_tokens // 16 + 1)]
+        return "\n".join(lines)
+
+    return StructuredTool.from_function(func=tavily_search)
+
+
+def run(prompt_cache: bool, args) -> tuple[dict, PromptCacheSimulator]:
+    simulator = PromptCacheSimulator(min_tokens=args.min_tokens)
+
+    def model(respond):
+        # Built like components._anthropic_model, with the recording client
+        return ScheduledChatModel(model=RecordingAnthropic(
+            model="claude-sonnet-4-5", temperature=0, respond=respond, simulator=simulator,
+            disable_streaming=True,
+        ))
+
+    set_components(Components(
+        Settings(prompt_cache=prompt_cache),
+        orchestrator_model=model(make_orchestrator_respond(args.research_calls, per_turn=1)),
+        researcher_model=model(make_researcher_respond(args.searches)),
+        planner_model=model(make_planner_respond()),
+        search_tool=make_search_tool(args.result_tokens),
+    ))
+    metrics = RunMetrics()
+    app = build_orchestrator().compile()
+    with contextlib.redirect_stdout(io.StringIO()):
+        asyncio.run(app.ainvoke(initial_state(0), config=budget_config({"callbacks": [metrics]})))
+    return metrics.summary(), simulator
+
+
+def prefix_stable(simulator: PromptCacheSimulator) -> tuple[int, int]:
+    """(orchestrator requests that start with the previous request's blocks, orchestrator requests - 1)."""
+    requests = [PromptCacheSimulator.blocks(payload) for stage, payload in simulator.requests if stage == "llm_call"]
+    stable = sum(
+        1 for before, after in zip(requests, requests[1:])
+        if [key for key, _, _ in after[:len(before)]] == [key for key, _, _ in before]
+    )
+    return stable, max(len(requests) - 1, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--research-calls", type=int, default=4, help="Researcher calls, one per orchestrator turn")
+    parser.add_argument("--searches", type=int, default=2, help="Searches per researcher call")
+    parser.add_argument("--result-tokens", type=int, default=800, help="Tokens of one search result")
+    parser.add_argument("--min-tokens", type=int, default=1024, help="Shortest cacheable prefix (1024 for Sonnet)")
+    parser.add_argument("--calls", action="store_true", help="Print the input tokens of every model call")
+    args = parser.parse_args()
+    # Every run starts cold, the savings are the prompt cache's alone
+    set_research_cache(None)
+
+    for prompt_cache in (False, True):
+        summary, simulator = run(prompt_cache, args)
+        read, write = summary["cache_read_tokens"], summary["cache_write_tokens"]
+        uncached = summary["input_tokens"] - read - write
+        billed = uncached + WRITE_PRICE * write + READ_PRICE * read
+        breakpoints = [sum(marked for _, _, marked in PromptCacheSimulator.blocks(payload)) for _, payload in simulator.requests]
+        stable, turns = prefix_stable(simulator)
+        print(f"prompt cache {'on ' if prompt_cache else 'off'}  {len(summary['calls'])} calls, {summary['input_tokens']} input tokens: "
+              f"{read} cached, {write} written, {uncached} uncached -> {billed:.0f} billed as input "
+              f"({billed / summary['input_tokens']:.0%})")
+        print(f"                 orchestrator prefix stable in {stable}/{turns} turns, "
+              f"breakpoints per request {min(breakpoints)}-{max(breakpoints)} (Anthropic allows 4)")
+        if args.calls:
+            for call in summary["calls"]:
+                print(f"    {call['stage']:9} {call['input_tokens']:6} in  {call['cache_read_tokens']:6} cached  "
+                      f"{call['cache_write_tokens']:6} written  {call['input_tokens'] - call['cache_read_tokens'] - call['cache_write_tokens']:6} uncached")
+
+
+if __name__ == "__main__":
+    main()
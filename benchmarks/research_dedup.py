@@ -0,0 +1,78 @@
+"""Researcher runs and searches saved by the research planner (agents/research_planner.py).
+
+A scripted orchestrator asks overlapping questions, within a turn and across turns, like
+the real one does. The plan runs with `research_dedup` on and off; the report shows the
+researcher runs, searches and tokens of both.
+
+    python -m benchmarks.research_dedup
+    python -m benchmarks.research_dedup --searches 3 --llm-latency 0.1
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+
+from benchmarks.fakes import FakeChatModel, install_fakes
+from benchmarks.graph import initial_state
+
+from langchain_core.messages import AIMessage, BaseMessage
+from travel_planner.agents import orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.instrumentation import RunMetrics
+from travel_planner.scheduler import ScheduledChatModel
+
+TURNS = [
+    ["Flights from Munich to Tokyo in February", "Hotels in Shinjuku", "Hotel options in Shinjuku for February",
+     "Weather in Tokyo in February"],
+    ["Cheapest flights MUC-NRT Feb 1", "Tokyo weather forecast for early February",
+     "Visa requirements for Germans in Japan", "Japan entry requirements for German citizens"],
+]
+
+
+def scripted_respond(messages: list[BaseMessage]) -> AIMessage:
+    turn = sum(1 for m in messages if m.type == "ai" and m.tool_calls)
+    if turn < len(TURNS):
+        return AIMessage(content=f"Research round {turn + 1}.", tool_calls=[
+            {"name": "call_researcher", "args": {"question": question}, "id": f"research-{turn}-{i}"}
+            for i, question in enumerate(TURNS[turn])
+        ])
+    return AIMessage(content="", tool_calls=[{"name": "call_planner", "args": {}, "id": "planner"}])
+
+
+async def run(dedup: bool) -> tuple[dict, dict]:
+    metrics = RunMetrics()
+    app = orchestrator.build_orchestrator().compile()
+    config = budget_config({"callbacks": [metrics], "configurable": {"research_dedup": dedup}})
+    with contextlib.redirect_stdout(io.StringIO()):
+        state = await app.ainvoke(initial_state(0), config=config)
+    return metrics.summary(), state.get("research_dedup") or {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--searches", type=int, default=2, help="Searches per researcher run")
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    components = install_fakes(llm_latency=args.llm_latency, search_latency=args.llm_latency, searches=args.searches)
+    components.override(orchestrator_model=ScheduledChatModel(model=FakeChatModel(respond=scripted_respond, latency=args.llm_latency)))
+    # Every question is new to the research cache, the savings are the planner's alone
+    set_research_cache(None)
+
+    questions = sum(len(turn) for turn in TURNS)
+    for dedup in (False, True):
+        summary, state = asyncio.run(run(dedup))
+        research = summary["research"]
+        tokens = sum(r["input_tokens"] + r["output_tokens"] for r in research)
+        print(f"dedup {'on ' if dedup else 'off'}  {questions} questions -> {len(research)} researcher runs, "
+              f"{sum(len(r['searches']) for r in research)} searches, {tokens} researcher tokens, {summary['wall_time']:.2f}s")
+        if dedup:
+            avoided = summary["research_avoided"]
+            print(f"           {state['answered_from_earlier']} answered from earlier research, {state['merged']} merged; "
+                  f"avoided {avoided['runs']} runs (~{avoided['searches']} searches)")
+
+
+if __name__ == "__main__":
+    main()
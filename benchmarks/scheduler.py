@@ -0,0 +1,70 @@
+"""Concurrent plans under a shared Anthropic limit, with and without stage priorities.
+
+Starts `--sessions` plans `--stagger` seconds apart through the fake models while the "anthropic" scheduler
+allows only `--concurrency` calls in flight, and reports per-plan latency, queue depth
+and the mean wait per stage. With priorities, planner calls of nearly finished plans
+overtake queued research, so plans finish earlier on average.
+
+    python -m benchmarks.scheduler
+    python -m benchmarks.scheduler --sessions 16 --concurrency 2 --llm-latency 0.05
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from benchmarks.fakes import install_fakes
+from benchmarks.graph import initial_state
+
+from travel_planner import scheduler
+from travel_planner.agents.orchestrator import get_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.persistence import new_thread_id, thread_config
+from travel_planner.scheduler import ProviderScheduler, get_scheduler, set_scheduler
+
+
+async def run_sessions(sessions: int, stagger: float) -> list[float]:
+    app = get_orchestrator()
+
+    async def plan(session: int) -> float:
+        await asyncio.sleep(session * stagger)
+        start = time.perf_counter()
+        config = budget_config({**thread_config(new_thread_id()), "metadata": {"session_id": f"session-{session}"}})
+        await app.ainvoke(initial_state(session), config=config)
+        return time.perf_counter() - start
+
+    return await asyncio.gather(*(plan(session) for session in range(sessions)))
+
+
+def run(args, priorities: dict) -> str:
+    scheduler.STAGE_PRIORITY = priorities
+    set_scheduler(ProviderScheduler("anthropic", max_concurrency=args.concurrency))
+    set_research_cache(None)
+    latencies = sorted(asyncio.run(run_sessions(args.sessions, args.stagger)))
+    stats = get_scheduler("anthropic").stats()
+    waits = ", ".join(f"{stage} {1000 * wait['mean']:.0f}" for stage, wait in sorted(stats["wait_seconds"].items()))
+    return (f"plan latency mean {statistics.mean(latencies):.2f}s, max {latencies[-1]:.2f}s  "
+            f"max queue {stats['max_queue_depth']:3}  mean wait (ms): {waits}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=2, help="Anthropic calls in flight at once")
+    parser.add_argument("--research-calls", type=int, default=4)
+    parser.add_argument("--llm-latency", type=float, default=0.02)
+    parser.add_argument("--stagger", type=float, default=0.05, help="Seconds between plan starts")
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.llm_latency, research_calls=args.research_calls)
+    priorities = dict(scheduler.STAGE_PRIORITY)
+    flat = run(args, {})
+    prioritized = run(args, priorities)
+    print(f"no priorities    {flat}")
+    print(f"stage priorities {prioritized}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""The HTTP API (travel_planner/server.py) against the fake models.
+
+Starts uvicorn with the app in-process and N plan jobs at once over HTTP, follows each
+job's event stream to its end and reports the time to the first event and to the
+finished plan, the events per job, and whether a cancelled job stops and reports
+"cancelled".
+
+    python -m benchmarks.server --jobs 16
+    python -m benchmarks.server --serve   # only the server with the fake models, for curl
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import statistics
+import time
+
+import httpx
+import uvicorn
+
+from benchmarks.fakes import install_fakes
+
+from travel_planner.cache import set_research_cache
+from travel_planner import server
+
+TRIP = {"home_city": "Munich", "start_date": "2026-02-01", "end_date": "2026-02-08", "budget": 3000.0}
+
+
+async def follow(client: httpx.AsyncClient, url: str) -> tuple[float, list[str]]:
+    """Reads an event stream to its "end" event, returns the time to the first event and the kinds."""
+    start, first, kinds = time.perf_counter(), None, []
+    async with client.stream("GET", url) as response:
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                first = first or time.perf_counter() - start
+                kinds.append(line[len("event: "):])
+                if kinds[-1] == "end":
+                    break
+    return first, kinds
+
+
+async def run_job(client: httpx.AsyncClient, session: int) -> dict:
+    start = time.perf_counter()
+    response = await client.post("/plans", json={**TRIP, "destination_city": f"Tokyo-{session}"})
+    job = response.json()
+    first_event, kinds = await follow(client, job["events"])
+    result = (await client.get(f"/plans/{job['id']}")).json()
+    return {"first_event": first_event, "total": time.perf_counter() - start, "events": len(kinds),
+            "plan_deltas": kinds.count("plan_delta"), "status": result["status"], "has_plan": bool(result["plan"])}
+
+
+async def run_cancel(client: httpx.AsyncClient, after: float) -> dict:
+    job = (await client.post("/plans", json={**TRIP, "destination_city": "Cancelled"})).json()
+    await asyncio.sleep(after)
+    start = time.perf_counter()
+    cancelled = (await client.delete(f"/plans/{job['id']}")).json()
+    _, kinds = await follow(client, job["events"])
+    return {"status": cancelled["status"], "cancel_seconds": time.perf_counter() - start, "last_event": kinds[-1]}
+
+
+async def run(jobs: int, cancel_after: float, port: int) -> tuple[list[dict], dict, float]:
+    # A real server: httpx's ASGITransport would buffer the event streams until they end
+    uvicorn_server = uvicorn.Server(uvicorn.Config(server.app, port=port, log_level="warning"))
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.01)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=None) as client:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(run_job(client, session) for session in range(jobs)))
+        wall_time = time.perf_counter() - start
+        cancel = await run_cancel(client, cancel_after)
+    uvicorn_server.should_exit = True
+    await serving
+    return results, cancel, wall_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=8)
+    parser.add_argument("--research-calls", type=int, default=3)
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.002)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--cancel-after", type=float, default=0.3, help="Seconds before the cancelled job is cancelled")
+    parser.add_argument("--serve", action="store_true", help="Run the server with the fakes instead")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    install_fakes(llm_latency=args.llm_latency, token_latency=args.token_latency,
+                  search_latency=args.search_latency, research_calls=args.research_calls)
+    set_research_cache(None)
+    if args.serve:
+        server.serve(port=args.port)
+        return
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, cancel, wall_time = asyncio.run(run(args.jobs, args.cancel_after, args.port))
+    first_events = [r["first_event"] for r in results]
+    summary = {
+        "jobs": args.jobs,
+        "wall_time": wall_time,
+        "done": sum(r["status"] == "done" and r["has_plan"] for r in results),
+        "first_event_mean": statistics.mean(first_events),
+        "first_event_max": max(first_events),
+        "job_seconds_mean": statistics.mean(r["total"] for r in results),
+        "events_per_job": statistics.mean(r["events"] for r in results),
+        "plan_deltas_per_job": statistics.mean(r["plan_deltas"] for r in results),
+        "cancel": cancel,
+    }
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"{summary['done']}/{args.jobs} jobs done in {wall_time:.2f}s, "
+          f"{summary['job_seconds_mean']:.2f}s per job")
+    print(f"first event after {summary['first_event_mean'] * 1000:.1f}ms (max {summary['first_event_max'] * 1000:.1f}ms), "
+          f"{summary['events_per_job']:.0f} events per job ({summary['plan_deltas_per_job']:.0f} plan deltas)")
+    print(f"cancel: status {cancel['status']}, last event {cancel['last_event']!r}, "
+          f"took {cancel['cancel_seconds'] * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
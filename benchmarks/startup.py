@@ -0,0 +1,72 @@
+"""Streamlit startup and rerun latency of app.py, run headless with AppTest.
+
+Measures the cold start, reruns caused by widget interactions and "Plan Trip" presses
+(with the fake models, so the time is graph setup and event handling, not LLM calls).
+Langfuse's auth_check is replaced by a sleep of `--auth-latency` seconds to stand in
+for its network round trip.
+
+    python -m benchmarks.startup --reruns 10
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import time
+
+from benchmarks.fakes import install_fakes
+
+import langfuse
+import travel_planner
+from streamlit.testing.v1 import AppTest
+from travel_planner.agents.orchestrator import orchestrator_builder
+from travel_planner.cache import set_research_cache
+
+APP_PATH = os.path.join(os.path.dirname(travel_planner.__file__), "app.py")
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=10)
+    parser.add_argument("--auth-latency", type=float, default=0.3, help="Simulated Langfuse auth_check seconds")
+    args = parser.parse_args()
+
+    def auth_check(self):
+        time.sleep(args.auth_latency)
+        return True
+
+    langfuse.Langfuse.auth_check = auth_check
+    install_fakes()
+    set_research_cache(None)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        at = AppTest.from_file(APP_PATH, default_timeout=60)
+        cold = timed(at.run)
+        assert not at.exception, at.exception
+
+        reruns = []
+        for i in range(args.reruns):
+            reruns.append(timed(at.number_input[0].set_value(1000 + 100 * i).run))
+
+        at.text_input[0].input("Munich")
+        at.text_input[1].input("Tokyo")
+        presses = [timed(at.button[0].click().run) for _ in range(args.reruns)]
+        assert not at.exception, at.exception
+
+    compile_time = statistics.mean(timed(orchestrator_builder.compile) for _ in range(args.reruns))
+
+    print(f"cold start:      {cold * 1000:8.1f} ms")
+    print(f"widget rerun:    {statistics.mean(reruns) * 1000:8.1f} ms (mean of {args.reruns})")
+    print(f"plan trip press: {statistics.mean(presses) * 1000:8.1f} ms (mean of {args.reruns}, fake models)")
+    print(f"graph compile:   {compile_time * 1000:8.1f} ms per call")
+
+
+if __name__ == "__main__":
+    main()
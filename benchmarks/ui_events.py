@@ -0,0 +1,92 @@
+"""Rendering cost of the UI event loop: full re-render per event vs incremental updates.
+
+Records the astream_events of one fake plan, then replays them through
+`ProgressTracker` and counts what a frontend has to render. The "full" model is the
+previous app.py behaviour: every tool event re-rendered every transcript item and
+every planner token re-rendered the whole plan preview.
+
+    python -m benchmarks.ui_events --research-calls 10 --plan-days 14
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+
+from benchmarks.fakes import install_fakes
+
+from langchain_core.messages import HumanMessage
+from travel_planner.agents.orchestrator import orchestrator_builder
+from travel_planner.budget import budget_config
+from travel_planner.cache import set_research_cache
+from travel_planner.progress import ProgressTracker
+
+
+async def record_events(app) -> list[dict]:
+    state = {"messages": [HumanMessage(content="Plan my trip")], "home_city": "Munich", "destination_city": "Tokyo"}
+    return [event async for event in app.astream_events(state, budget_config(), version="v2")]
+
+
+def full_render_cost(events: list[dict]) -> tuple[int, int]:
+    """Items and plan characters rendered by the old re-render-everything loop."""
+    tracker = ProgressTracker(preview_interval=0, preview_bytes=0)
+    items_rendered = plan_chars = 0
+    for event in events:
+        updates = tracker.handle(event)
+        if any(update.kind == "item" for update in updates):
+            items_rendered += len(tracker.items)
+        plan_chars += sum(len(update.text) for update in updates if update.kind == "plan_preview")
+    return items_rendered, plan_chars
+
+
+def incremental_render_cost(events: list[dict], token_interval: float) -> tuple[int, int, int]:
+    """Items, plan characters and preview updates rendered with the tracker's updates.
+
+    The clock advances by `token_interval` per streamed token to replay at a realistic pace.
+    """
+    ticks = iter(range(len(events) * 2))
+    tracker = ProgressTracker(clock=lambda: next(ticks) * token_interval)
+    items_rendered = plan_chars = previews = 0
+    for event in events:
+        for update in tracker.handle(event) + (tracker.flush_preview() if event is events[-1] else []):
+            if update.kind == "item":
+                items_rendered += 1
+            elif update.kind == "plan_preview":
+                previews += 1
+                plan_chars += len(update.text)
+    return items_rendered, plan_chars, previews
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--research-calls", type=int, default=10)
+    parser.add_argument("--plan-days", type=int, default=14)
+    parser.add_argument("--token-interval", type=float, default=0.02, help="Simulated seconds between planner tokens")
+    parser.add_argument("--repeat", type=int, default=20, help="Replays for the tracker throughput")
+    args = parser.parse_args()
+
+    install_fakes(research_calls=args.research_calls, plan_days=args.plan_days)
+    set_research_cache(None)
+    with contextlib.redirect_stdout(io.StringIO()):
+        events = asyncio.run(record_events(orchestrator_builder.compile()))
+
+    full_items, full_chars = full_render_cost(events)
+    items, chars, previews = incremental_render_cost(events, args.token_interval)
+    tokens = sum(1 for event in events if event["event"] == "on_chat_model_stream")
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        tracker = ProgressTracker()
+        for event in events:
+            tracker.handle(event)
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(events)} events, {tokens} streamed tokens")
+    print(f"full re-render:  {full_items} items, {full_chars} plan chars, {tokens} preview updates")
+    print(f"incremental:     {items} items, {chars} plan chars, {previews} preview updates")
+    print(f"tracker:         {len(events) * args.repeat / elapsed:,.0f} events/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,210 @@
+import re
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.runnables import RunnableConfig
+
+from travel_planner.agents.planner import SYSTEM_PROMPT as PLANNER_PROMPT, planner_input
+from travel_planner.cache import categorize, normalize_text
+from travel_planner.graph.state import OrchestratorState
+
+# Default for config["configurable"]["research_token_budget"]
+RESEARCH_TOKEN_BUDGET = 6000
+
+# Paragraphs sharing this much of their words are treated as the same finding
+DUPLICATE_SIMILARITY = 0.8
+
+SECTION_TITLES = {
+    "flights": "Flights",
+    "accommodation": "Accommodation",
+    "activities": "Activities & Events",
+    "weather": "Weather",
+    "logistics": "Visa & Logistics",
+    "general": "Other Findings",
+}
+
+URL_PATTERN = re.compile(r"https?://[^\s)\]>]+")
+PRICE_PATTERN = re.compile(r"(?:[$€£¥]\s?\d[\d,.]*|\d[\d,.]*\s?(?:USD|EUR|JPY|GBP|CHF)\b)")
+# The |---|:---:| row below a Markdown table's header
+TABLE_SEPARATOR = re.compile(r"^\s*\|[\s:|-]*-[\s:|-]*$")
+
+
+def format_requirements(state: OrchestratorState) -> str:
+    return f"""### User Requirements:
+- From: {state.get('home_city', 'Not specified')}
+- To: {state.get('destination_city', 'Not specified')}
+- Dates: {state.get('start_date', '?')} to {state.get('end_date', '?')}
+- Budget: {state.get('budget', 'Not specified')}
+- Notes: {state.get('additional_info', 'None')}
+"""
+
+
+def _text(message: BaseMessage) -> str:
+    content = message.content
+    if isinstance(content, list):
+        return "\n".join(block.get("text", "") if isinstance(block, dict) else getattr(block, "text", "") for block in content)
+    return content
+
+
+def _placeholder(message: ToolMessage) -> bool:
+    return isinstance(message.artifact, dict) and ("answered_by" in message.artifact or "skipped" in message.artifact)
+
+
+def cut_short(message: ToolMessage) -> bool:
+    """A researcher result that is the raw search results of a call out of search rounds."""
+    return isinstance(message.artifact, dict) and bool(message.artifact.get("cut_short"))
+
+
+def research_answers(messages: list[BaseMessage], reusable: bool = False) -> list[tuple[str, str]]:
+    """(question, answer) of every call_researcher result, in order.
+
+    Results that only point to another answer (see research_planner) or were skipped for
+    the run's budget are left out. With `reusable`, so are the raw search results of calls
+    that ran out of search rounds: good enough for this plan, not an answer for others.
+    """
+    questions = {}
+    answers = []
+    for message in messages:
+        if isinstance(message, AIMessage):
+            for tool_call in message.tool_calls:
+                if tool_call["name"] == "call_researcher":
+                    questions[tool_call["id"]] = tool_call["args"].get("question", "")
+        elif isinstance(message, ToolMessage) and message.tool_call_id in questions and not _placeholder(message):
+            if reusable and cut_short(message):
+                continue
+            answers.append((questions[message.tool_call_id], _text(message)))
+    return answers
+
+
+def planner_outline(messages: list[BaseMessage]) -> str:
+    """The orchestrator's text when it handed over to the planner, i.e. its outline."""
+    for message in reversed(messages):
+        if isinstance(message, AIMessage) and any(tc["name"] == "call_planner" for tc in message.tool_calls):
+            return _text(message).strip()
+    return ""
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def _score(block: str) -> int:
+    """How much hard data (prices, links) a paragraph holds, to decide what to drop first."""
+    return 2 * len(PRICE_PATTERN.findall(block)) + 2 * len(URL_PATTERN.findall(block)) + 1
+
+
+def _new_lines(paragraph: str, seen_lines: set[str]) -> list[str]:
+    """The lines of a paragraph without list items and table rows another answer already reported.
+
+    Every table keeps its header and separator rows, two answers' tables often share them
+    (outbound and return flights). A table left without data rows is dropped.
+    """
+    lines = []
+    # Header and separator of the current table, until its first new data row
+    header = []
+    in_table = False
+    for line in paragraph.strip().splitlines():
+        table_row = line.lstrip().startswith("|")
+        if table_row and (not in_table or TABLE_SEPARATOR.match(line)):
+            in_table = True
+            header.append(line)
+            continue
+        in_table = table_row
+        key = normalize_text(line)
+        if len(key) > 20 and key in seen_lines:
+            continue
+        seen_lines.add(key)
+        if table_row:
+            lines += header
+        header = []
+        lines.append(line)
+    return lines
+
+
+def compact_research(state: OrchestratorState, token_budget: int = RESEARCH_TOKEN_BUDGET) -> tuple[str, dict]:
+    """Build a compact research brief from the orchestrator history.
+
+    Research answers are split into paragraphs, duplicate and near-duplicate paragraphs
+    across answers are dropped, and the rest is grouped by category. The orchestrator's
+    intermediate reasoning is left out, only its final outline is kept. If the brief exceeds
+    `token_budget`, the paragraphs with the least prices and links are dropped first; the
+    requirements, outline and sources are always kept.
+    """
+    messages = state["messages"]
+    answers = research_answers(messages)
+
+    # (category, question, paragraph)
+    blocks = []
+    seen_words = []
+    seen_lines = set()
+    duplicates = 0
+    for question, answer in answers:
+        category = categorize(question)
+        for paragraph in re.split(r"\n\s*\n", answer):
+            paragraph = "\n".join(_new_lines(paragraph, seen_lines)).strip()
+            if not paragraph:
+                duplicates += 1
+                continue
+            words = set(normalize_text(paragraph).split())
+            if any(_similarity(words, other) >= DUPLICATE_SIMILARITY for other in seen_words):
+                duplicates += 1
+                continue
+            seen_words.append(words)
+            blocks.append((category, question, paragraph))
+
+    urls = list(dict.fromkeys(url.rstrip(".,") for _, answer in answers for url in URL_PATTERN.findall(answer)))
+    prices = sum(len(PRICE_PATTERN.findall(answer)) for _, answer in answers)
+    outline = planner_outline(messages)
+
+    def render(kept: list[int]) -> str:
+        parts = [format_requirements(state)]
+        if outline:
+            parts.append("### Orchestrator Outline:\n" + outline)
+        for category, title in SECTION_TITLES.items():
+            section = [i for i in kept if blocks[i][0] == category]
+            if not section:
+                continue
+            parts.append(f"### {title}")
+            question = None
+            for i in section:
+                if blocks[i][1] != question:
+                    question = blocks[i][1]
+                    parts.append(f"#### Research: {question}")
+                parts.append(blocks[i][2])
+        if urls:
+            parts.append("### Sources\n" + "\n".join(f"- {url}" for url in urls))
+        return "\n\n".join(parts)
+
+    kept = list(range(len(blocks)))
+    brief = render(kept)
+    # Drop the paragraphs with the least hard data first, later ones before earlier ones
+    for i in sorted(kept, key=lambda i: (_score(blocks[i][2]), -i)):
+        if count_tokens_approximately([HumanMessage(content=brief)]) <= token_budget:
+            break
+        kept.remove(i)
+        brief = render(kept)
+
+    stats = {
+        "research_answers": len(answers),
+        "paragraphs_kept": len(kept),
+        "duplicates_dropped": duplicates,
+        "dropped_for_budget": len(blocks) - len(kept),
+        "urls": len(urls),
+        "prices": prices,
+    }
+    return brief, stats
+
+
+def compact(state: OrchestratorState, config: RunnableConfig):
+    """Compacts the research into a brief for the planner and records the token savings"""
+    token_budget = config.get("configurable", {}).get("research_token_budget", RESEARCH_TOKEN_BUDGET)
+    brief, stats = compact_research(state, token_budget)
+
+    tokens_before = count_tokens_approximately([SystemMessage(content=PLANNER_PROMPT)] + state["messages"])
+    tokens_after = count_tokens_approximately(planner_input({**state, "research_brief": brief}))
+    return {
+        "research_brief": brief,
+        "compaction": {**stats, "tokens_before": tokens_before, "tokens_after": tokens_after},
+    }
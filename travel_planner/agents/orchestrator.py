@@ -1,32 +1,39 @@
-from typing import Literal
+import asyncio
+import logging
+import time
+from functools import lru_cache
+from typing import Literal, Optional
 
-from langchain.messages import SystemMessage, ToolMessage
-from langchain.tools import tool
-from langchain_core.messages import HumanMessage
-from langchain_core.runnables import RunnableConfig
-from langchain_anthropic import ChatAnthropic
+from langchain_core.tools import StructuredTool, tool
+from langchain_core.callbacks import adispatch_custom_event, dispatch_custom_event
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import ContextThreadPoolExecutor, merge_configs
 from langgraph.graph import END, START, StateGraph
-from pprint import pprint
+from pprint import pformat
 
-from travel_planner.agents.researcher import researcher, SYSTEM_PROMPT
-from travel_planner.agents.planner import planner
+from travel_planner.agents.researcher import OUT_OF_STEPS, SYSTEM_PROMPT
+from travel_planner.agents.compactor import compact, cut_short, format_requirements, research_answers
+from travel_planner.agents.planner import aplanner, planner
+from travel_planner.agents.research_planner import (
+    ResearchPlan, plan_research, prefetch_questions, reused_message, reused_questions,
+)
+from travel_planner.budget import Budget, charge, message_tokens, usage
+from travel_planner.cache import get_plan_cache, get_research_cache
+from travel_planner.components import get_components
 from travel_planner.graph.state import OrchestratorState
+from travel_planner.persistence import get_checkpointer
+from travel_planner.progress import PROGRESS_TAG, extract_ai_text
+from travel_planner.prompt_cache import model_input, system_message
 
-# Global to pass config to tools (set by tool_call node)
-_current_config: RunnableConfig | None = None
+# Upper bound for tool calls of one AI message that run at the same time.
+# Can be overridden per run via config["configurable"]["max_parallel_tool_calls"].
+MAX_PARALLEL_TOOL_CALLS = 4
 
+logger = logging.getLogger(__name__)
 
-def build_system_prompt(state: OrchestratorState) -> str:
-    context = f"""
 
-### User Requirements:
-- From: {state.get('home_city', 'Not specified')}
-- To: {state.get('destination_city', 'Not specified')}
-- Dates: {state.get('start_date', '?')} to {state.get('end_date', '?')}
-- Budget: {state.get('budget', 'Not specified')}
-- Notes: {state.get('additional_info', 'None')}
-"""
-    return """## You are an expert Travel Orchestrator. Your goal is to manage the end-to-end creation of a bespoke travel itinerary.
+ORCHESTRATOR_PROMPT = """## You are an expert Travel Orchestrator. Your goal is to manage the end-to-end creation of a bespoke travel itinerary.
 
 ### Your Workflow:
 1. Analyze Requirements: Review the user's home city, destination, dates, budget, and preferences. If the user has not provided all the information, pick the ideal values for the missing information, you would recommend based on the other information you have. DO NOT ASK THE USER FOR THE MISSING INFORMATION, JUST PICK THE IDEAL VALUES.
@@ -38,78 +45,353 @@ def build_system_prompt(state: OrchestratorState) -> str:
 Work iteratively. Before calling any tool, reason about what you are doing next and why.
 
 ### Constraint: You are a coordinator. You do not write the final itinerary yourself; you delegate that to the Planner once you have sufficient data.
-""" + context
+"""
 
-@tool
-def call_researcher(question: str) -> str:
+def trip_context(state: OrchestratorState) -> str:
+    """The part of the system prompt that is fixed for a run, after the instructions shared by all runs."""
+    context = format_requirements(state)
+    cached_plan = state.get("cached_plan")
+    if cached_plan:
+        context += "\n### Earlier Research:\nThe research results already in the conversation were gathered for a very similar trip and are still current, do not research them again."
+        if cached_plan["stale_questions"]:
+            context += " These topics are outdated and need to be researched again:\n" + "\n".join(f"- {q}" for q in cached_plan["stale_questions"])
+    return context
+
+def orchestrator_input(state: OrchestratorState) -> list[BaseMessage]:
+    """Instructions, trip context, then the history: a prefix that only grows from turn to turn."""
+    return [system_message(ORCHESTRATOR_PROMPT, trip_context(state))] + state["messages"]
+
+def _researcher_input(question: str) -> dict:
+    return {"messages": [system_message(SYSTEM_PROMPT), HumanMessage(content=question)]}
+
+def _researcher_config(config: RunnableConfig) -> RunnableConfig:
+    # The researcher's ReAct loop ends with OUT_OF_STEPS after max_researcher_steps search rounds
+    return {**config, "recursion_limit": Budget.from_config(config).researcher_recursion_limit()}
+
+def _researcher_answer(question: str, config: RunnableConfig, researcher_result: dict) -> tuple[str, dict]:
+    messages = researcher_result["messages"]
+    response = messages[-1]
+    # Handle both string content and list content (Anthropic format)
+    content = response.content
+    if isinstance(content, list):
+        # Anthropic returns list of content blocks
+        content = content[0]["text"] if isinstance(content[0], dict) else content[0].text
+
+    tokens = sum(message_tokens(m) for m in messages)
+    steps = sum(1 for m in messages if isinstance(m, AIMessage) and m.tool_calls)
+    if content == OUT_OF_STEPS:
+        # Out of search rounds: hand back the raw results instead, and don't cache them
+        results = [str(m.content)[:1500] for m in messages if isinstance(m, ToolMessage)]
+        content = f"Research stopped after {steps} search rounds, the search results so far:\n\n" + "\n\n".join(results)
+        return content, {"tokens": tokens, "steps": steps, "cut_short": True}
+
+    cache = get_research_cache()
+    if cache is not None:
+        cache.set_answer(question, config.get("configurable", {}).get("trip"), content, tokens)
+    return content, {"tokens": tokens, "steps": steps}
+
+def _cached_answer(question: str, config: RunnableConfig):
+    cache = get_research_cache()
+    cached = cache.get_answer(question, config.get("configurable", {}).get("trip")) if cache is not None else None
+    return (cached, {"tokens": 0, "steps": 0}) if cached is not None else None
+
+def research(question: str, config: RunnableConfig) -> tuple[str, dict]:
     """
     Call the researcher agent to find real-time data on flights, hotels, weather, and local events.
 
     Args:
         question (str): The question you have for the researcher agent.
     """
-    global _current_config
-    researcher_result = researcher.invoke(
-        {"messages": [SystemMessage(content=SYSTEM_PROMPT), HumanMessage(content=question)]},
-        config=_current_config  # Pass config so events propagate
-    )
-    response = researcher_result["messages"][-1]
-    # Handle both string content and list content (Anthropic format)
-    content = response.content
-    if isinstance(content, list):
-        # Anthropic returns list of content blocks
-        return content[0]["text"] if isinstance(content[0], dict) else content[0].text
-    return content
+    cached = _cached_answer(question, config)
+    if cached is not None:
+        return cached
+    # Config of this tool run, so events are nested under it
+    result = get_components().get("researcher").invoke(_researcher_input(question), config=_researcher_config(config))
+    return _researcher_answer(question, config, result)
+
+async def aresearch(question: str, config: RunnableConfig) -> tuple[str, dict]:
+    cached = _cached_answer(question, config)
+    if cached is not None:
+        return cached
+    result = await get_components().get("researcher").ainvoke(_researcher_input(question), config=_researcher_config(config))
+    return _researcher_answer(question, config, result)
+
+# Runs the researcher with ainvoke when the tool is awaited. The artifact of its
+# ToolMessage holds the tokens and search rounds the answer took, for the run's budget.
+call_researcher = StructuredTool.from_function(
+    func=research, coroutine=aresearch, name="call_researcher", response_format="content_and_artifact",
+)
 
 @tool
 def call_planner() -> str:
     """Call the planner agent to format the final itinerary for the user."""
     return "Routing to planner..."
 
-#llm = ChatOpenAI(model="gpt-5.2-2025-12-11", temperature=0)
-llm = ChatAnthropic(model="claude-sonnet-4-5", temperature=0)
-model_with_tools = llm.bind_tools([call_researcher, call_planner])
-tools_by_name = {tool.name: tool for tool in [call_researcher, call_planner]}
+# The orchestrator's model is built with these bound on first use, see components
+TOOLS = [call_researcher, call_planner]
+tools_by_name = {tool.name: tool for tool in TOOLS}
+
+def budget_handover(reason: str, iteration: int) -> AIMessage:
+    """Hands over to the planner once the run's budget is used up."""
+    return AIMessage(
+        content=f"The {reason} budget of this run is used up, handing over to the planner with the research gathered so far.",
+        tool_calls=[{"name": "call_planner", "args": {}, "id": f"budget-handover-{iteration}"}],
+    )
+
+def _exhausted_update(state: OrchestratorState, budget: Budget) -> dict:
+    used = usage(state)
+    reason = budget.exhausted(used)
+    if reason is None:
+        return {}
+    return {"messages": [budget_handover(reason, used["iterations"])], "budget_usage": {**used, "exhausted": reason}}
 
-def llm_call(state: OrchestratorState):
+def _exhausted_event(update: dict) -> dict:
+    return {"reason": update["budget_usage"]["exhausted"], "message": update["messages"][0].content, "usage": update["budget_usage"]}
+
+def llm_call(state: OrchestratorState, config: RunnableConfig):
     """LLM decides whether to call a tool or not"""
+    budget = Budget.from_config(config)
+    exhausted = _exhausted_update(state, budget)
+    if exhausted:
+        dispatch_custom_event("budget_exhausted", _exhausted_event(exhausted), config=config)
+        return exhausted
+
+    started = time.perf_counter()
+    response = get_components().get("model_with_tools").invoke(model_input(orchestrator_input(state)))
+    return {
+        "messages": [response],
+        "budget_usage": charge(state, budget, started, iterations=1, tokens=message_tokens(response)),
+    }
 
+async def allm_call(state: OrchestratorState, config: RunnableConfig):
+    budget = Budget.from_config(config)
+    exhausted = _exhausted_update(state, budget)
+    if exhausted:
+        await adispatch_custom_event("budget_exhausted", _exhausted_event(exhausted), config=config)
+        return exhausted
+
+    started = time.perf_counter()
+    response = await get_components().get("model_with_tools").ainvoke(model_input(orchestrator_input(state)))
     return {
-        "messages": [
-            model_with_tools.invoke(
-                [
-                    SystemMessage(
-                        content=build_system_prompt(state)
-                    )
-                ]
-                + state["messages"]
-            )
-        ],
+        "messages": [response],
+        "budget_usage": charge(state, budget, started, iterations=1, tokens=message_tokens(response)),
     }
 
+def trip_parameters(state: OrchestratorState) -> dict:
+    """The trip fields of the state, e.g. to key cached research answers."""
+    fields = ["home_city", "destination_city", "start_date", "end_date", "budget", "additional_info"]
+    return {field: state.get(field) for field in fields}
+
+def warm_start_messages(research: list[tuple]) -> list[BaseMessage]:
+    """Research of a cached plan, as if the orchestrator had just asked for it."""
+    tool_calls = [
+        {"name": "call_researcher", "args": {"question": question}, "id": f"cached-research-{i}"}
+        for i, (question, *_) in enumerate(research)
+    ]
+    return [AIMessage(content="Reusing research of a similar trip.", tool_calls=tool_calls)] + [
+        ToolMessage(content=answer, tool_call_id=tool_call["id"]) for tool_call, (_, answer, _) in zip(tool_calls, research)
+    ]
+
+def lookup_plan(state: OrchestratorState, config: RunnableConfig):
+    """Serves the cached plan of a matching trip, or starts from its research that is still fresh"""
+    cache = get_plan_cache()
+    match = cache.lookup(trip_parameters(state)) if cache is not None else None
+    if match is None:
+        return {}
+
+    cached_plan = {"trip": match.trip, "exact": match.exact, "age": match.age, "served": match.fresh,
+                   "stale_questions": match.stale_questions,
+                   "researched_at": {question: at for question, _, at in match.fresh_research}}
+    if match.fresh:
+        dispatch_custom_event("cached_plan", {**cached_plan, "plan": match.plan}, config=config)
+        return {"messages": [AIMessage(content=match.plan)], "cached_plan": cached_plan}
+
+    messages = warm_start_messages(match.fresh_research)
+    dispatch_custom_event("warm_start", {
+        **cached_plan,
+        "research": [{"id": tc["id"], "question": tc["args"]["question"], "answer": m.content}
+                     for tc, m in zip(messages[0].tool_calls, messages[1:])],
+    }, config=config)
+    return {"messages": messages, "cached_plan": cached_plan}
+
+def complete_research(state: OrchestratorState) -> bool:
+    """Whether the run researched what the orchestrator asked for, without running out of budget."""
+    if (state.get("budget_usage") or {}).get("exhausted"):
+        return False
+    return not any(
+        isinstance(message, ToolMessage) and (cut_short(message) or
+                                              (isinstance(message.artifact, dict) and "skipped" in message.artifact))
+        for message in state["messages"]
+    )
+
+def cache_plan(state: OrchestratorState):
+    """Stores the finished plan and its research for later, similar trips.
+    Plans of runs that ran out of budget or search rounds would be served as partial
+    plans to requests with a full budget, they aren't stored."""
+    cache = get_plan_cache()
+    if cache is not None and complete_research(state):
+        cache.store(
+            trip_parameters(state), extract_ai_text(state["messages"][-1].content),
+            research_answers(state["messages"], reusable=True),
+            researched_at=(state.get("cached_plan") or {}).get("researched_at"),
+        )
+    return {}
+
+def route_lookup(state: OrchestratorState, config: RunnableConfig) -> Literal["prefetch", "llm_call", END]:
+    cached_plan = state.get("cached_plan")
+    if cached_plan:
+        # A warm start already has the research that is still fresh
+        return END if cached_plan["served"] else "llm_call"
+    # Settings.prefetch unless the run says otherwise
+    prefetch = config.get("configurable", {}).get("prefetch")
+    return "prefetch" if (get_components().settings.prefetch if prefetch is None else prefetch) else "llm_call"
+
+def _tool_config(tool_call: dict, config: RunnableConfig) -> RunnableConfig:
+    # Tag the tool run (and everything nested in it) with the id of the tool call,
+    # so event consumers can attribute concurrent calls correctly
+    return merge_configs(config, {"metadata": {"orchestrator_tool_call_id": tool_call["id"]}})
+
+def _invoke_tool(tool_call: dict, config: RunnableConfig) -> ToolMessage:
+    # Invoked with the whole tool call, so the ToolMessage keeps the tool's artifact
+    return tools_by_name[tool_call["name"]].invoke({**tool_call, "type": "tool_call"}, _tool_config(tool_call, config))
+
+async def _ainvoke_tool(tool_call: dict, config: RunnableConfig) -> ToolMessage:
+    return await tools_by_name[tool_call["name"]].ainvoke({**tool_call, "type": "tool_call"}, _tool_config(tool_call, config))
+
+def _tool_call_config(state: OrchestratorState, config: RunnableConfig) -> tuple[RunnableConfig, int]:
+    config = merge_configs(config, {"configurable": {"trip": trip_parameters(state)}})
+    return config, config.get("configurable", {}).get("max_parallel_tool_calls", MAX_PARALLEL_TOOL_CALLS)
+
+def _plan_research(state: OrchestratorState, config: RunnableConfig) -> ResearchPlan:
+    tool_calls = state["messages"][-1].tool_calls
+    # Can be turned off per run via config["configurable"]["research_dedup"]
+    if not config.get("configurable", {}).get("research_dedup", True):
+        return ResearchPlan(calls=list(tool_calls))
+    messages = state["messages"]
+    return plan_research(tool_calls, research_answers(messages, reusable=True), reused_questions(messages), trip_parameters(state))
+
+def _reused_event(tool_call: dict, answered_by: str, merged: bool) -> dict:
+    return {"tool_call_id": tool_call["id"], "question": tool_call["args"].get("question", ""),
+            "answered_by": answered_by, "merged": merged}
+
+def _budget_skips(state: OrchestratorState, budget: Budget, plan: ResearchPlan) -> tuple[Optional[str], list[dict]]:
+    """The used up budget and the researcher calls to skip because of it."""
+    reason = budget.exhausted(usage(state), iterations=False)
+    if reason is None:
+        return None, []
+    return reason, [tool_call for tool_call in plan.calls if tool_call["name"] == "call_researcher"]
+
+def _skipped_message(tool_call: dict, reason: str) -> ToolMessage:
+    return ToolMessage(
+        content=f"Not researched, the {reason} budget of this run is used up.",
+        tool_call_id=tool_call["id"], artifact={"skipped": reason},
+    )
+
+def _research_update(state: OrchestratorState, plan: ResearchPlan, results: list[ToolMessage], budget: Budget,
+                     started: float, reason: Optional[str], skipped: list[dict]) -> dict:
+    """Tool messages in the order of the tool calls, the researcher runs avoided and the budget used so far"""
+    messages = {message.tool_call_id: message for message in results}
+    for tool_call, answered_by, merged in plan.reused:
+        messages[tool_call["id"]] = reused_message(tool_call, answered_by, merged)
+    for tool_call in skipped:
+        messages[tool_call["id"]] = _skipped_message(tool_call, reason)
+    tool_calls = state["messages"][-1].tool_calls
+    dedup = dict(state.get("research_dedup") or {"questions": 0, "researcher_runs": 0, "answered_from_earlier": 0, "merged": 0})
+    dedup["questions"] += sum(1 for tool_call in tool_calls if tool_call["name"] == "call_researcher")
+    dedup["researcher_runs"] += plan.researcher_runs - len(skipped)
+    dedup["answered_from_earlier"] += sum(1 for _, _, merged in plan.reused if not merged)
+    dedup["merged"] += sum(1 for _, _, merged in plan.reused if merged)
+
+    # Researcher answers carry their tokens and search rounds, see call_researcher
+    artifacts = [m.artifact for m in results if isinstance(m.artifact, dict) and "tokens" in m.artifact]
+    used = charge(state, budget, started, tokens=sum(a["tokens"] for a in artifacts),
+                  researcher_steps=sum(a["steps"] for a in artifacts))
+    if reason is not None:
+        used["exhausted"] = reason
+    return {"messages": [messages[tool_call["id"]] for tool_call in tool_calls], "research_dedup": dedup, "budget_usage": used}
+
 def tool_call(state: OrchestratorState, config: RunnableConfig):
-    """Performs the tool call"""
-    global _current_config
-    _current_config = config  # Make config available to tools
-    
-    result = []
-    for tool_call in state["messages"][-1].tool_calls:
-        tool = tools_by_name[tool_call["name"]]
-        observation = tool.invoke(tool_call["args"])
-        result.append(ToolMessage(content=observation, tool_call_id=tool_call["id"]))
-    
-    _current_config = None
-    return {"messages": result}
+    """Performs the tool calls concurrently, keeping the order of the AI message.
+    Researcher calls covered by earlier or parallel ones are answered without a run,
+    and none run once the run's time or token budget is used up."""
+    started = time.perf_counter()
+    budget = Budget.from_config(config)
+    plan = _plan_research(state, config)
+    reason, skipped = _budget_skips(state, budget, plan)
+    for reused in plan.reused:
+        dispatch_custom_event("research_reused", _reused_event(*reused), config=config)
+    for tool_call in skipped:
+        dispatch_custom_event("research_skipped", {"tool_call_id": tool_call["id"], "reason": reason}, config=config)
+    tool_calls = [tool_call for tool_call in plan.calls if tool_call not in skipped]
+    config, max_workers = _tool_call_config(state, config)
+
+    if len(tool_calls) <= 1 or max_workers <= 1:
+        result = [_invoke_tool(tool_call, config) for tool_call in tool_calls]
+    else:
+        with ContextThreadPoolExecutor(max_workers=min(max_workers, len(tool_calls))) as executor:
+            result = list(executor.map(lambda tool_call: _invoke_tool(tool_call, config), tool_calls))
+
+    return _research_update(state, plan, result, budget, started, reason, skipped)
+
+async def atool_call(state: OrchestratorState, config: RunnableConfig):
+    started = time.perf_counter()
+    budget = Budget.from_config(config)
+    plan = _plan_research(state, config)
+    reason, skipped = _budget_skips(state, budget, plan)
+    for reused in plan.reused:
+        await adispatch_custom_event("research_reused", _reused_event(*reused), config=config)
+    for tool_call in skipped:
+        await adispatch_custom_event("research_skipped", {"tool_call_id": tool_call["id"], "reason": reason}, config=config)
+    tool_calls = [tool_call for tool_call in plan.calls if tool_call not in skipped]
+    config, max_workers = _tool_call_config(state, config)
+    semaphore = asyncio.Semaphore(max(1, max_workers))
+
+    async def ainvoke_tool(tool_call: dict) -> ToolMessage:
+        async with semaphore:
+            return await _ainvoke_tool(tool_call, config)
+
+    result = list(await asyncio.gather(*(ainvoke_tool(tool_call) for tool_call in tool_calls)))
+    return _research_update(state, plan, result, budget, started, reason, skipped)
+
+def _prefetch_message(state: OrchestratorState) -> AIMessage:
+    questions = prefetch_questions(trip_parameters(state))
+    return AIMessage(
+        content="Researching the topics every trip needs first: " + ", ".join(questions) + ".",
+        tool_calls=[{"name": "call_researcher", "args": {"question": question}, "id": f"prefetch-{category}"}
+                    for category, question in questions.items()],
+    )
+
+def _prefetch_event(message: AIMessage) -> dict:
+    return {"research": [{"id": tc["id"], "question": tc["args"]["question"]} for tc in message.tool_calls]}
+
+def prefetch(state: OrchestratorState, config: RunnableConfig):
+    """Researches the standard topics concurrently, so the orchestrator's first turn already has the results"""
+    message = _prefetch_message(state)
+    if not message.tool_calls:
+        return {}
+    dispatch_custom_event("prefetch", _prefetch_event(message), config=config)
+    update = tool_call({**state, "messages": state["messages"] + [message]}, config)
+    return {**update, "messages": [message] + update["messages"]}
+
+async def aprefetch(state: OrchestratorState, config: RunnableConfig):
+    message = _prefetch_message(state)
+    if not message.tool_calls:
+        return {}
+    await adispatch_custom_event("prefetch", _prefetch_event(message), config=config)
+    update = await atool_call({**state, "messages": state["messages"] + [message]}, config)
+    return {**update, "messages": [message] + update["messages"]}
 
 def transfer(state: OrchestratorState) -> Literal["research", "orchestrate", END]:
-    pprint(state.get("messages", []))
+    # Formatting the whole history on every transition is expensive, only do it when asked
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Orchestrator messages:\n%s", pformat(state.get("messages", [])))
     if state.get("is_finished", False):
         return END
     messages = state["messages"]
     last_message = messages[-1]
 
     if last_message.content == "Routing to planner...":
-        return "planner"
+        return "compact"
 
     # Only AIMessage has tool_calls, ToolMessage doesn't
     if hasattr(last_message, "tool_calls") and last_message.tool_calls:
@@ -117,12 +399,43 @@ def transfer(state: OrchestratorState) -> Literal["research", "orchestrate", END
 
     return "llm_call"
 
-orchestrator_builder = StateGraph(OrchestratorState)
-orchestrator_builder.add_node("llm_call", llm_call)
-orchestrator_builder.add_node("tool_call", tool_call)
-orchestrator_builder.add_node("planner", planner)
+def node(func, afunc=None) -> RunnableLambda:
+    """A graph node that runs `afunc` when the graph runs asynchronously (ainvoke,
+    astream_events) and `func` when it runs synchronously (invoke)."""
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+def build_orchestrator(async_nodes: bool = True) -> StateGraph:
+    """The orchestrator graph. Without `async_nodes`, async runs do the model calls of
+    llm_call, tool_call and planner on worker threads (e.g. to benchmark the difference)."""
+    builder = StateGraph(OrchestratorState)
+    builder.add_node("lookup_plan", lookup_plan)
+    builder.add_node("prefetch", node(prefetch, aprefetch) if async_nodes else prefetch)
+    # The model output of llm_call and planner is rendered, see progress.EVENT_FILTER
+    progress = RunnableConfig(tags=[PROGRESS_TAG])
+    builder.add_node("llm_call", (node(llm_call, allm_call) if async_nodes else RunnableLambda(llm_call)).with_config(progress))
+    builder.add_node("tool_call", node(tool_call, atool_call) if async_nodes else tool_call)
+    builder.add_node("compact", compact)
+    builder.add_node("planner", (node(planner, aplanner) if async_nodes else RunnableLambda(planner)).with_config(progress))
+    builder.add_node("cache_plan", cache_plan)
 
-orchestrator_builder.add_edge(START, "llm_call")
-orchestrator_builder.add_conditional_edges("llm_call", transfer, ["tool_call", "llm_call"])
-orchestrator_builder.add_conditional_edges("tool_call", transfer, ["llm_call", "planner"])
-orchestrator_builder.add_edge("planner", END)
\ No newline at end of file
+    builder.add_edge(START, "lookup_plan")
+    builder.add_conditional_edges("lookup_plan", route_lookup, ["prefetch", "llm_call", END])
+    builder.add_edge("prefetch", "llm_call")
+    builder.add_conditional_edges("llm_call", transfer, ["tool_call", "llm_call"])
+    builder.add_conditional_edges("tool_call", transfer, ["llm_call", "compact"])
+    builder.add_edge("compact", "planner")
+    builder.add_edge("planner", "cache_plan")
+    builder.add_edge("cache_plan", END)
+    return builder
+
+orchestrator_builder = build_orchestrator()
+
+@lru_cache(maxsize=None)
+def get_orchestrator():
+    """The compiled orchestrator graph, built once per process.
+
+    Compiling is not free and the graph holds no per-request state, so every request
+    shares it and attaches its own callbacks at invoke time. Unless checkpointing is
+    turned off, state is saved after every node and runs need a thread_id.
+    """
+    return orchestrator_builder.compile(checkpointer=get_checkpointer())
@@ -1,9 +1,7 @@
-from langchain.messages import SystemMessage
-from langchain_anthropic import ChatAnthropic
+from langchain_core.messages import BaseMessage, HumanMessage
+from travel_planner.components import get_components
 from travel_planner.graph.state import OrchestratorState
-
-#llm = ChatOpenAI(model="gpt-5.2-2025-12-11", temperature=0)
-llm = ChatAnthropic(model="claude-sonnet-4-5", temperature=0)
+from travel_planner.prompt_cache import model_input, system_message
 
 SYSTEM_PROMPT = """## You are a Expert Travel Planner. Your task is to take the message history provided to you and turn it into a high-end, detailed travel itinerary.
 
@@ -19,17 +17,28 @@ SYSTEM_PROMPT = """## You are a Expert Travel Planner. Your task is to take the
 ### Constraint:
 Make sure to stay within the user's budget."""
 
+def planner_input(state: OrchestratorState) -> list[BaseMessage]:
+    """The compacted research brief if there is one, else the full orchestrator history.
+
+    The instructions come first, so they are a prefix shared by every plan.
+    """
+    if state.get("research_brief"):
+        return [system_message(SYSTEM_PROMPT), HumanMessage(content=state["research_brief"])]
+    return [system_message(SYSTEM_PROMPT)] + state["messages"]
+
+# The planner is called once per plan, a breakpoint after the history would only pay for a
+# cache write. Its instructions are the same for every plan.
 def planner(state: OrchestratorState):
     return {
         "messages": [
-            llm.invoke(
-                [
-                    SystemMessage(
-                        content=SYSTEM_PROMPT
-                    )
-                ]
-                + state["messages"]
-            )
+            get_components().get("planner_model").invoke(model_input(planner_input(state), history=False))
+        ],
+    }
+
+async def aplanner(state: OrchestratorState):
+    return {
+        "messages": [
+            await get_components().get("planner_model").ainvoke(model_input(planner_input(state), history=False))
         ],
     }
 
@@ -0,0 +1,216 @@
+"""Research planning: avoid researcher runs for questions that overlap.
+
+The orchestrator tends to ask the same thing twice, in the same turn or a later one
+("flights Munich Tokyo February", then "cheapest flights MUC-NRT Feb 1"), and every
+call_researcher is a full ReAct loop with its own searches. Before the tool calls of a
+turn run, their questions are compared with the questions already answered in this run
+and with each other:
+
+- a question that closely matches an earlier one is answered by pointing to that answer,
+- pending questions on the same topic are merged into one researcher call.
+
+Runs can also start with the research every trip needs (prefetch_questions), before
+the orchestrator's first turn asks for it.
+
+Similarity is lexical and works offline: questions of different categories (see
+cache.categorize) never match, and within a category it is the Jaccard similarity of the
+content words, without stop words, filler like "cheapest" and what the trip already
+fixes (cities, dates, airport codes). The direction between the trip's cities is kept:
+questions that name opposite directions ("from Munich to Tokyo", "from Tokyo to
+Munich") never match. Merging also needs more than one shared content word, so
+"flights to Tokyo" and "flights to Osaka" stay separate calls.
+"""
+
+import re
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Optional
+
+from langchain_core.messages import BaseMessage, ToolMessage
+
+from travel_planner.cache import categorize, normalize_text
+
+# A question this similar to an answered one is answered by that answer
+ANSWER_SIMILARITY = 0.75
+# Pending questions this similar are researched together
+MERGE_SIMILARITY = 0.5
+# ... if they also share this many content words
+MERGE_SHARED_TERMS = 2
+
+STOPWORDS = {
+    "a", "about", "an", "and", "any", "are", "around", "at", "be", "between", "by", "can", "do", "during", "for",
+    "from", "get", "how", "i", "in", "is", "it", "me", "much", "my", "near", "of", "on", "or", "the", "there",
+    "to", "trip", "what", "when", "where", "which", "with", "within",
+}
+FILLER = {
+    "available", "best", "cheap", "cheapest", "current", "currently", "details", "find", "good", "info",
+    "information", "latest", "option", "options", "price", "prices", "recommend", "recommendation",
+    "recommendations", "search", "top",
+}
+MONTHS = ["january", "february", "march", "april", "may", "june", "july", "august", "september", "october",
+          "november", "december"]
+
+# Airport and city codes like MUC or NRT, the trip already fixes where from and to
+CODE_PATTERN = re.compile(r"\b[A-Z]{3}\b")
+
+
+def _stem(word: str) -> str:
+    if word.endswith("ies") and len(word) > 4:
+        return word[:-3] + "y"
+    if word.endswith("s") and not word.endswith("ss") and len(word) > 3:
+        return word[:-1]
+    return word
+
+
+def _trip_words(trip: Optional[dict]) -> set[str]:
+    """Words that are implied by the trip, and so say nothing about the topic."""
+    words = set()
+    for key in ("home_city", "destination_city"):
+        words.update(normalize_text((trip or {}).get(key) or "").split())
+    for key in ("start_date", "end_date"):
+        try:
+            month = MONTHS[date.fromisoformat(str((trip or {}).get(key))).month - 1]
+        except ValueError:
+            continue
+        words.update((month, month[:3]))
+    return words
+
+
+def question_terms(question: str, trip: Optional[dict] = None) -> frozenset[str]:
+    """The content words of a question."""
+    text = normalize_text(CODE_PATTERN.sub(" ", question))
+    ignored = STOPWORDS | FILLER | _trip_words(trip)
+    return frozenset(_stem(word) for word in text.split() if word not in ignored and not word.isdigit())
+
+
+def question_direction(question: str, trip: Optional[dict] = None) -> Optional[tuple[str, str]]:
+    """("home", "destination") or the reverse if the question names a direction between the
+    trip's cities: by "from" or "to" before a city, else by their order. None if it doesn't."""
+    words = normalize_text(question).split()
+    found = []  # (position, role, word before the city)
+    for role, key in (("home", "home_city"), ("destination", "destination_city")):
+        city = normalize_text((trip or {}).get(key) or "").split()
+        for i in range(len(words) - len(city) + 1) if city else ():
+            if words[i:i + len(city)] == city:
+                found.append((i, role, words[i - 1] if i else ""))
+    origin = next((role for _, role, before in found if before == "from"), None)
+    target = next((role for _, role, before in found if before in ("to", "into")), None)
+    if origin is None and target is None:
+        roles = list(dict.fromkeys(role for _, role, _ in sorted(found)))
+        if len(roles) < 2:
+            return None
+        origin, target = roles
+    other = {"home": "destination", "destination": "home"}
+    origin, target = origin or other[target], target or other[origin]
+    return (origin, target) if origin != target else None
+
+
+def shared_terms(a: str, b: str, trip: Optional[dict] = None) -> int:
+    return len(question_terms(a, trip) & question_terms(b, trip))
+
+
+def similarity(a: str, b: str, trip: Optional[dict] = None) -> float:
+    if categorize(a) != categorize(b):
+        return 0.0
+    direction_a, direction_b = question_direction(a, trip), question_direction(b, trip)
+    if direction_a and direction_b and direction_a != direction_b:
+        return 0.0
+    terms_a, terms_b = question_terms(a, trip), question_terms(b, trip)
+    if not terms_a and not terms_b:
+        return 1.0
+    return len(terms_a & terms_b) / len(terms_a | terms_b)
+
+
+def merge_questions(questions: list[str]) -> str:
+    return questions[0] + "".join(f"\nAlso cover in the same answer: {question}" for question in questions[1:])
+
+
+def reused_questions(messages: list[BaseMessage]) -> set[str]:
+    """Normalized questions of this run that were answered with an earlier answer."""
+    return {
+        normalize_text(message.artifact["question"]) for message in messages
+        if isinstance(message, ToolMessage) and isinstance(message.artifact, dict) and "answered_by" in message.artifact
+    }
+
+
+@dataclass
+class ResearchPlan:
+    """What to do with the tool calls of one orchestrator turn."""
+    # Tool calls to run, merged researcher calls with all their questions
+    calls: list[dict] = field(default_factory=list)
+    # (tool call, question whose answer covers it, merged with a call of this turn)
+    reused: list[tuple[dict, str, bool]] = field(default_factory=list)
+
+    @property
+    def researcher_runs(self) -> int:
+        return sum(1 for call in self.calls if call["name"] == "call_researcher")
+
+
+def plan_research(tool_calls: list[dict], answered: list[tuple[str, str]], reused: set[str] = frozenset(),
+                  trip: Optional[dict] = None) -> ResearchPlan:
+    """Answers researcher calls from `answered` (question, answer) pairs or merges them.
+
+    Questions in `reused` were already answered with an earlier answer once; asked again,
+    the orchestrator apparently needs more, so they are researched.
+    """
+    plan = ResearchPlan()
+    # Index in plan.calls -> questions merged into that call
+    groups: dict[int, list[str]] = {}
+    for tool_call in tool_calls:
+        question = tool_call["args"].get("question", "") if tool_call["name"] == "call_researcher" else None
+        if question is None:
+            plan.calls.append(tool_call)
+            continue
+
+        if normalize_text(question) not in reused:
+            earlier = max(answered, key=lambda qa: similarity(question, qa[0], trip), default=None)
+            if earlier is not None and similarity(question, earlier[0], trip) >= ANSWER_SIMILARITY:
+                plan.reused.append((tool_call, earlier[0], False))
+                continue
+
+        group = max(groups, key=lambda i: similarity(question, groups[i][0], trip), default=None)
+        if (group is not None and similarity(question, groups[group][0], trip) >= MERGE_SIMILARITY
+                and shared_terms(question, groups[group][0], trip) >= MERGE_SHARED_TERMS):
+            groups[group].append(question)
+            plan.reused.append((tool_call, groups[group][0], True))
+            continue
+        groups[len(plan.calls)] = [question]
+        plan.calls.append(tool_call)
+
+    for i, questions in groups.items():
+        if len(questions) > 1:
+            call = plan.calls[i]
+            plan.calls[i] = {**call, "args": {**call["args"], "question": merge_questions(questions)}}
+    return plan
+
+
+# The topics every plan needs, see researcher.SYSTEM_PROMPT; None if a trip field is missing
+PREFETCH_TOPICS = {
+    "flights": "Flights from {home_city} to {destination_city} on {start_date}, returning on {end_date}, with airlines and prices",
+    "accommodation": "Hotels in {destination_city} from {start_date} to {end_date} for a total trip budget of {budget}",
+    "activities": "Things to do and seasonal events in {destination_city} between {start_date} and {end_date}",
+    "logistics": "Visa requirements for travelers from {home_city} to {destination_city} and local transport tips",
+}
+
+
+def prefetch_questions(trip: dict) -> dict[str, str]:
+    """Category -> question of the standard topics the trip has the fields for."""
+    questions = {}
+    for category, template in PREFETCH_TOPICS.items():
+        fields = re.findall(r"{(\w+)}", template)
+        if all(trip.get(field) not in (None, "") for field in fields):
+            questions[category] = template.format(**trip)
+    return questions
+
+
+def reused_message(tool_call: dict, answered_by: str, merged: bool) -> ToolMessage:
+    """Result of a researcher call that didn't run, pointing to the answer that covers it."""
+    if merged:
+        content = f"Researched together with '{answered_by}', see that answer."
+    else:
+        content = (f"Already researched as '{answered_by}', see that answer above. "
+                   "Ask a more specific question if it doesn't cover what you need.")
+    return ToolMessage(
+        content=content, tool_call_id=tool_call["id"],
+        artifact={"question": tool_call["args"].get("question", ""), "answered_by": answered_by, "merged": merged},
+    )
@@ -1,13 +1,8 @@
-from langchain.tools import tool
-from langgraph.prebuilt import create_react_agent
-from langchain_anthropic import ChatAnthropic
-from langchain_tavily import TavilySearch
+"""Prompt of the researcher agent.
 
-
-from dotenv import load_dotenv
-import os
-
-load_dotenv()
+The agent itself (a ReAct loop over the Tavily search tool, see agents/search.py) is
+built on first use by travel_planner.components.
+"""
 
 SYSTEM_PROMPT = """## You are a Travel Research Specialist. Your job is to provide accurate, up-to-date information using the Tavily search tool, based on a question that is given to you.
 
@@ -20,14 +15,5 @@ SYSTEM_PROMPT = """## You are a Travel Research Specialist. Your job is to provi
 Always provide URLs or source names where possible to ensure the Planner can include booking links. Return your findings in Markdown format.
 """
 
-tavily_search_tool = TavilySearch(
-    max_results=5,
-    topic="general",
-)
-
-#llm = ChatOpenAI(model="gpt-5.2-2025-12-11", temperature=0)
-llm = ChatAnthropic(model="claude-sonnet-4-5", temperature=0)
-researcher = create_react_agent(
-    llm, 
-    [tavily_search_tool],
-)
\ No newline at end of file
+# What create_react_agent answers when it runs out of steps (recursion_limit)
+OUT_OF_STEPS = "Sorry, need more steps to process this request."
@@ -0,0 +1,39 @@
+from langchain_tavily import TavilySearch
+
+from travel_planner.cache import get_research_cache
+from travel_planner.scheduler import get_scheduler, request_context
+
+
+class CachedTavilySearch(TavilySearch):
+    """TavilySearch that serves repeated queries from the research cache.
+
+    Searches that do hit Tavily wait for a slot of the shared "tavily" scheduler.
+    """
+
+    def _cache_params(self, kwargs: dict) -> dict:
+        return {**kwargs, "max_results": self.max_results, "topic": self.topic}
+
+    def _run(self, query: str, run_manager=None, **kwargs):
+        cache = get_research_cache()
+        if cache is not None:
+            cached = cache.get_search(query, self._cache_params(kwargs))
+            if cached is not None:
+                return cached
+        with get_scheduler("tavily").slot(*request_context(run_manager.metadata if run_manager else None)):
+            result = super()._run(query, run_manager=run_manager, **kwargs)
+        # Failed searches are returned as {"error": ...}, don't keep those around
+        if cache is not None and "error" not in result:
+            cache.set_search(query, self._cache_params(kwargs), result)
+        return result
+
+    async def _arun(self, query: str, run_manager=None, **kwargs):
+        cache = get_research_cache()
+        if cache is not None:
+            cached = cache.get_search(query, self._cache_params(kwargs))
+            if cached is not None:
+                return cached
+        async with get_scheduler("tavily").aslot(*request_context(run_manager.metadata if run_manager else None)):
+            result = await super()._arun(query, run_manager=run_manager, **kwargs)
+        if cache is not None and "error" not in result:
+            cache.set_search(query, self._cache_params(kwargs), result)
+        return result
@@ -1,22 +1,41 @@
 import asyncio
+import threading
+import uuid
 import streamlit as st
 from datetime import date, timedelta
-from dotenv import load_dotenv
+from travel_planner.components import load_env
 
-load_dotenv()
+load_env()
 
-from langfuse.langchain import CallbackHandler
 from langchain_core.messages import HumanMessage
-from travel_planner.agents.orchestrator import orchestrator_builder
-from langfuse import get_client
+from travel_planner.agents.orchestrator import get_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.instrumentation import RunMetrics
+from travel_planner.persistence import get_event_store, new_thread_id, run_status, thread_config
+from travel_planner.progress import ProgressItem, ProgressTracker, Update, stream_progress
 
-langfuse = get_client()
- 
-# Verify connection
-if langfuse.auth_check():
-    print("Langfuse client is authenticated and ready!")
-else:
-    print("Authentication failed. Please check your credentials and host.")
+
+@st.cache_resource(show_spinner=False)
+def check_langfuse_connection() -> threading.Thread:
+    """Verify the Langfuse credentials once per process, in the background.
+
+    auth_check is a blocking network call and the script reruns on every interaction.
+    """
+    def check():
+        # Langfuse takes a while to import, not worth holding up the first render for
+        from langfuse import get_client
+
+        if get_client().auth_check():
+            print("Langfuse client is authenticated and ready!")
+        else:
+            print("Authentication failed. Please check your credentials and host.")
+
+    thread = threading.Thread(target=check, daemon=True)
+    thread.start()
+    return thread
+
+
+check_langfuse_connection()
 
 st.set_page_config(page_title="Travel Planner", page_icon="✈️", layout="centered")
 
@@ -41,41 +60,69 @@ with st.sidebar:
     plan_button = st.button("Plan Trip", type="primary", use_container_width=True)
 
 
-def extract_content(content: str) -> str:
-    """Extract content from nested message string."""
-    if content.startswith("content='"):
-        start = len("content='")
-        for i, char in enumerate(content[start:], start):
-            if char == "'" and content[i-1] != "\\":
-                return content[start:i].replace("\\n", "\n")
-    return content
+def render_item(item: ProgressItem):
+    """Render one transcript entry into the current container."""
+    if item.type == "ai":
+        with st.chat_message("assistant", avatar="🧠"):
+            st.markdown(item.content)
+        return
 
+    icon = "✅" if item.done else "⏳"
+    short_q = item.content[:80] + "..." if len(item.content) > 80 else item.content
+
+    with st.expander(f"{icon} 🔍 {short_q}", expanded=not item.done):
+        if item.sub_steps:
+            for step in item.sub_steps:
+                step_icon = "✅" if step.done else "🔄"
+                st.markdown(f"{step_icon} {step.name}")
+                if step.result:
+                    st.caption(step.result[:300] + "..." if len(step.result) > 300 else step.result)
+        elif not item.done:
+            st.info("Researching...")
+
+        if item.done and item.result:
+            st.divider()
+            st.markdown("**Result:**")
+            st.markdown(item.result)
+
+
+def render_metrics(summary: dict):
+    """Where the time and tokens of the run went."""
+    with st.expander(f"⏱️ Run metrics · {summary['wall_time']:.0f}s · {summary['input_tokens'] + summary['output_tokens']:,} tokens"):
+        st.table([
+            {"Stage": stage, "Calls": data["count"], "Seconds": round(data["seconds"], 1),
+             "Input tokens": data["input_tokens"], "Output tokens": data["output_tokens"],
+             "First token (s)": round(data["ttft"], 1) if "ttft" in data else None}
+            for stage, data in summary["stages"].items()
+        ])
+        if summary["research"]:
+            st.markdown("**Research calls**")
+            st.table([
+                {"Question": research["question"], "Seconds": round(research["seconds"], 1),
+                 "Steps": research["llm_steps"], "Searches": len(research["searches"]),
+                 "Input tokens": research["input_tokens"], "Output tokens": research["output_tokens"]}
+                for research in summary["research"]
+            ])
+        avoided = summary["research_avoided"]
+        if avoided["runs"]:
+            st.caption(f"♻️ {avoided['runs']} researcher runs (~{avoided['searches']} searches) avoided for overlapping questions")
+
+
+async def run_planner_async(thread_id: str, trip: dict, resume: bool = False, live: bool = True):
+    """Run the agent with streaming updates including sub-agent progress.
+
+    The stored events of the thread are rendered first, so a resumed run continues the
+    transcript where it stopped. With live=False nothing is run and the thread is only
+    replayed from its events.
+    """
+    from langfuse.langchain import CallbackHandler
 
-async def run_planner_async(home_city: str, destination_city: str, start_date: str, 
-                end_date: str, budget: float, additional_info: str):
-    """Run the agent with streaming updates including sub-agent progress."""
-    
     langfuse_handler = CallbackHandler()
-    app = orchestrator_builder.compile().with_config(config={"callbacks": [langfuse_handler]})
+    metrics = RunMetrics()
+    app = get_orchestrator()
+    event_store = get_event_store()
     
-    initial_state = {
-        "messages": [HumanMessage(content="Plan my trip")],
-        "home_city": home_city,
-        "destination_city": destination_city,
-        "start_date": start_date,
-        "end_date": end_date,
-        "budget": budget,
-        "additional_info": additional_info
-    }
-    
-    # Unified message stream - maintains true order
-    # Each item: {"type": "ai"|"tool_call"|"tool_result", "content": ..., "id": ...}
-    message_stream = []
-    tool_states = {}  # tool_id -> {"sub_steps": [], "result": None, "done": False}
-    current_tool_id = None
-    final_plan = None
-    plan_streaming = False
-    plan_chunks = []
+    tracker = ProgressTracker()
     
     # UI containers
     status_placeholder = st.empty()
@@ -83,187 +130,55 @@ async def run_planner_async(home_city: str, destination_city: str, start_date: s
     planner_status_container = st.container()
     plan_container = st.container()
     
-    messages_placeholder = messages_container.empty()
     planner_status_placeholder = planner_status_container.empty()
     plan_preview_placeholder = planner_status_container.empty()
+    # One placeholder per transcript item, only re-rendered when that item changes
+    item_placeholders = []
     
-    def extract_ai_text(content) -> str:
-        """Extract text from AI message content (handles both string and list formats)."""
-        if isinstance(content, str):
-            return content
-        elif isinstance(content, list):
-            texts = []
-            for block in content:
-                if isinstance(block, dict) and block.get("type") == "text":
-                    texts.append(block.get("text", ""))
-                elif hasattr(block, "text"):
-                    texts.append(block.text)
-            return "\n".join(texts)
-        return str(content)
-    
-    def render_messages():
-        """Render all messages in order."""
-        with messages_placeholder.container():
-            for msg in message_stream:
-                if msg["type"] == "ai":
-                    with st.chat_message("assistant", avatar="🧠"):
-                        st.markdown(msg["content"])
-                
-                elif msg["type"] == "tool_call":
-                    tool_id = msg["id"]
-                    tool_state = tool_states.get(tool_id, {})
-                    done = tool_state.get("done", False)
-                    sub_steps = tool_state.get("sub_steps", [])
-                    result = tool_state.get("result")
-                    
-                    icon = "✅" if done else "⏳"
-                    question = msg["content"]
-                    short_q = question[:80] + "..." if len(question) > 80 else question
-                    
-                    with st.expander(f"{icon} 🔍 {short_q}", expanded=not done):
-                        if sub_steps:
-                            for step in sub_steps:
-                                step_icon = "✅" if step.get("done") else "🔄"
-                                st.markdown(f"{step_icon} {step['name']}")
-                                if step.get("result"):
-                                    st.caption(step["result"][:300] + "..." if len(step.get("result", "")) > 300 else step.get("result", ""))
-                        elif not done:
-                            st.info("Researching...")
-                        
-                        if done and result:
-                            st.divider()
-                            st.markdown("**Result:**")
-                            st.markdown(result)
-    
-    # Stream events using astream_events to capture nested runnable events
-    async for event in app.astream_events(initial_state, version="v2"):
-        event_type = event["event"]
-        event_name = event.get("name", "")
-        metadata = event.get("metadata", {})
-        langgraph_node = metadata.get("langgraph_node", "")
-        
-        # Track when orchestrator LLM produces output
-        if event_type == "on_chat_model_end":
-            output = event.get("data", {}).get("output")
-            
-            # Capture AI messages from the orchestrator's llm_call node
-            if langgraph_node == "llm_call" and output:
-                # Extract and display the AI's reasoning/text
-                if hasattr(output, "content") and output.content:
-                    ai_text = extract_ai_text(output.content)
-                    if ai_text.strip():
-                        message_stream.append({"type": "ai", "content": ai_text})
-                        render_messages()
-                
-                # Track tool calls - add them to the stream
-                if hasattr(output, "tool_calls") and output.tool_calls:
-                    researcher_calls = [tc for tc in output.tool_calls if tc["name"] == "call_researcher"]
-                    if researcher_calls:
-                        status_placeholder.info(f"🔍 Researching {len(researcher_calls)} queries...")
-                        for tc in researcher_calls:
-                            question = tc["args"].get("question", "Planning...")
-                            tool_states[tc["id"]] = {"sub_steps": [], "result": None, "done": False}
-                            message_stream.append({"type": "tool_call", "id": tc["id"], "content": question})
-                        render_messages()
+    def apply(updates: list[Update]):
+        for update in updates:
+            if update.kind == "item":
+                if update.index == len(item_placeholders):
+                    item_placeholders.append(messages_container.empty())
+                with item_placeholders[update.index].container():
+                    render_item(tracker.items[update.index])
             
-            # Check if this is the planner's output
-            if langgraph_node == "planner":
-                if output and hasattr(output, "content") and output.content:
-                    final_plan = output.content
-                    status_placeholder.success("✅ Plan ready!")
-        
-        # Handle tool start events
-        elif event_type == "on_tool_start":
-            # Track when call_researcher tool starts
-            if event_name == "call_researcher":
-                run_id = event.get("run_id", "")
-                # Find the tool_id for this run
-                for tool_id, state in tool_states.items():
-                    if not state.get("done") and not state.get("_run_id"):
-                        state["_run_id"] = run_id
-                        current_tool_id = tool_id
-                        break
+            elif update.kind == "status":
+                status_placeholder.info(update.text)
             
-            # Track Tavily search starts (sub-agent tool calls)
-            elif "tavily" in event_name.lower():
-                if current_tool_id and current_tool_id in tool_states:
-                    query = event.get("data", {}).get("input", {})
-                    query_str = query.get("query", str(query)) if isinstance(query, dict) else str(query)
-                    tool_states[current_tool_id]["sub_steps"].append({
-                        "name": f"🔍 {query_str[:70]}",
-                        "run_id": event.get("run_id"),
-                        "done": False
-                    })
-                    render_messages()
-        
-        # Handle tool end events
-        elif event_type == "on_tool_end":
-            # Track Tavily search completions
-            if "tavily" in event_name.lower():
-                run_id = event.get("run_id")
-                if current_tool_id and current_tool_id in tool_states:
-                    for step in tool_states[current_tool_id]["sub_steps"]:
-                        if step.get("run_id") == run_id:
-                            step["done"] = True
-                            output = event.get("data", {}).get("output", "")
-                            if output:
-                                step["result"] = str(output)[:300]
-                            break
-                    render_messages()
+            elif update.kind == "plan_ready":
+                status_placeholder.success("✅ Plan ready!")
             
-            # Track when call_researcher tool completes
-            elif event_name == "call_researcher":
-                output = event.get("data", {}).get("output", "")
-                if current_tool_id and current_tool_id in tool_states:
-                    content = str(output)
-                    if hasattr(output, 'content'):
-                        content = output.content
-                    elif content.startswith("content='"):
-                        content = extract_content(content)
-                    tool_states[current_tool_id]["result"] = content
-                    tool_states[current_tool_id]["done"] = True
-                    current_tool_id = None
-                    
-                    render_messages()
-                    done_count = sum(1 for s in tool_states.values() if s.get("done"))
-                    total = len(tool_states)
-                    status_placeholder.info(f"📊 Research: {done_count}/{total} complete")
-            
-            # Track when call_planner tool completes (routing to planner)
-            elif event_name == "call_planner":
-                status_placeholder.info("✨ Creating your personalized travel plan...")
+            elif update.kind == "planner_started":
                 with planner_status_placeholder.container():
                     st.markdown("### ✍️ Writing Your Itinerary")
                     st.caption("Combining research into a comprehensive travel plan...")
-        
-        # Handle chat model streaming for live plan preview
-        elif event_type == "on_chat_model_stream":
-            if langgraph_node == "planner":
-                chunk = event.get("data", {}).get("chunk")
-                if chunk and hasattr(chunk, "content") and chunk.content:
-                    if not plan_streaming:
-                        plan_streaming = True
-                        plan_chunks = []
-                    plan_chunks.append(chunk.content)
-                    # Update preview with streamed content
-                    with plan_preview_placeholder.container():
-                        st.markdown("".join(plan_chunks) + "▌")
-        
-        # Handle chat model start for planner
-        elif event_type == "on_chat_model_start":
-            if langgraph_node == "planner":
-                status_placeholder.info("✨ Creating your personalized travel plan...")
-                with planner_status_placeholder.container():
-                    st.markdown("### ✍️ Writing Your Itinerary")
-                    with st.spinner("Crafting the perfect travel experience..."):
-                        pass
+            
+            elif update.kind == "plan_preview":
+                plan_preview_placeholder.markdown(update.text + "▌")
+    
+    if event_store is not None:
+        for event in event_store.events(thread_id):
+            apply(tracker.handle(event))
+    
+    if live:
+        # The session id lets the shared rate limit scheduler queue browser sessions fairly
+        session_id = st.session_state.setdefault("session_id", str(uuid.uuid4()))
+        config = budget_config({**thread_config(thread_id), "callbacks": [langfuse_handler, metrics], "metadata": {"session_id": session_id}})
+        # Only the events the transcript is made of, nested researcher runs included
+        initial_state = None if resume else {"messages": [HumanMessage(content="Plan my trip")], **trip}
+        async for progress in stream_progress(app, initial_state, config, tracker):
+            if event_store is not None:
+                event_store.append(thread_id, progress.event)
+            apply(progress.updates)
     
     # Clear the streaming preview once done
-    if plan_streaming:
+    if tracker.plan_streaming or tracker.final_plan:
         planner_status_placeholder.empty()
         plan_preview_placeholder.empty()
     
     # Show final plan
+    final_plan = tracker.final_plan
     if final_plan:
         with plan_container:
             st.divider()
@@ -272,33 +187,60 @@ async def run_planner_async(home_city: str, destination_city: str, start_date: s
             st.download_button(
                 "Download as Markdown",
                 final_plan,
-                file_name=f"trip_{destination_city.lower().replace(' ', '_')}.md"
+                file_name=f"trip_{trip['destination_city'].lower().replace(' ', '_')}.md"
             )
+    
+    if live:
+        render_metrics(metrics.summary())
 
 
-def run_planner(home_city: str, destination_city: str, start_date: str, 
-                end_date: str, budget: float, additional_info: str):
+def run_planner(thread_id: str, trip: dict, resume: bool = False, live: bool = True):
     """Wrapper to run async planner in Streamlit."""
-    asyncio.run(run_planner_async(
-        home_city, destination_city, start_date, end_date, budget, additional_info
-    ))
+    asyncio.run(run_planner_async(thread_id, trip, resume, live))
+
+
+def trip_caption(trip: dict) -> str:
+    days = (date.fromisoformat(trip["end_date"]) - date.fromisoformat(trip["start_date"])).days
+    return f"{trip['home_city']} → {trip['destination_city']} · {days} days · ${trip['budget']:,.0f}"
 
 
 # Main logic
+# Checkpointed runs are linked via ?run=<thread id>, so a refresh or rerun can pick them up again
+checkpointing = get_event_store() is not None
+stored_run = st.query_params.get("run") if checkpointing else None
+
 if plan_button:
     if not home_city or not destination_city:
         st.error("Please enter both departure and destination cities.")
     elif start_date >= end_date:
         st.error("End date must be after start date.")
     else:
-        st.caption(f"{home_city} → {destination_city} · {(end_date - start_date).days} days · ${budget:,}")
-        run_planner(
-            home_city=home_city,
-            destination_city=destination_city,
-            start_date=str(start_date),
-            end_date=str(end_date),
-            budget=float(budget),
-            additional_info=additional_info or ""
-        )
+        thread_id = new_thread_id()
+        if checkpointing:
+            st.query_params["run"] = thread_id
+        trip = {
+            "home_city": home_city,
+            "destination_city": destination_city,
+            "start_date": str(start_date),
+            "end_date": str(end_date),
+            "budget": float(budget),
+            "additional_info": additional_info or ""
+        }
+        st.caption(trip_caption(trip))
+        run_planner(thread_id, trip)
+elif stored_run:
+    app = get_orchestrator()
+    status = run_status(app, stored_run)
+    if status == "new":
+        st.warning("This run could not be found, it may have been deleted.")
+    else:
+        trip = app.get_state(thread_config(stored_run)).values
+        st.caption(trip_caption(trip))
+        resume = False
+        if status == "interrupted":
+            st.warning("This run was interrupted. Resuming continues after its last completed step.")
+            resume = st.button("Resume run")
+        # Finished and not resumed runs are rebuilt from their stored events, without calling any model
+        run_planner(stored_run, trip, resume=True, live=resume)
 else:
     st.info("Fill in your trip details in the sidebar and click **Plan Trip** to get started.")
@@ -0,0 +1,183 @@
+"""Plan many trips from a JSONL or CSV file with bounded concurrency.
+
+Every input record needs an `id` plus the trip fields of OrchestratorState (home_city,
+destination_city, start_date, end_date, budget, additional_info). Plans are written as
+soon as they finish, either as `<id>.md` files into a directory or as lines of a JSONL
+file, and ids that already have a plan there are skipped, so an interrupted batch can
+simply be started again.
+"""
+
+import asyncio
+import csv
+import hashlib
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+from langchain_core.rate_limiters import InMemoryRateLimiter
+
+from travel_planner.agents.orchestrator import get_orchestrator
+from travel_planner.budget import budget_config
+from travel_planner.instrumentation import RunMetrics
+from travel_planner.persistence import run_status, thread_config
+from travel_planner.progress import extract_ai_text
+
+TRIP_FIELDS = ["home_city", "destination_city", "start_date", "end_date", "budget", "additional_info"]
+
+# HTTP status codes of provider errors that are worth retrying
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+
+
+def read_trips(path: str) -> list[dict]:
+    with open(path, newline="") as f:
+        if path.endswith(".csv"):
+            trips = list(csv.DictReader(f))
+        else:
+            trips = [json.loads(line) for line in f if line.strip()]
+    for trip in trips:
+        trip["id"] = str(trip["id"])
+        if trip.get("budget") not in (None, ""):
+            trip["budget"] = float(trip["budget"])
+    return trips
+
+
+def is_retryable(error: Exception) -> bool:
+    """Rate limits, overloads, timeouts and connection errors of the providers."""
+    status = getattr(error, "status_code", None) or getattr(getattr(error, "response", None), "status_code", None)
+    if status in RETRYABLE_STATUS:
+        return True
+    name = type(error).__name__
+    return any(kind in name for kind in ("RateLimit", "Overloaded", "Timeout", "Connection"))
+
+
+class PlanWriter:
+    """Writes finished plans to a directory of Markdown files or to a JSONL file."""
+
+    def __init__(self, output: str):
+        self.output = output
+        self.jsonl = output.endswith(".jsonl")
+        if not self.jsonl:
+            os.makedirs(output, exist_ok=True)
+
+    def completed_ids(self) -> set[str]:
+        if not self.jsonl:
+            return {name[:-3] for name in os.listdir(self.output) if name.endswith(".md")}
+        if not os.path.exists(self.output):
+            return set()
+        with open(self.output) as f:
+            return {json.loads(line)["id"] for line in f if line.strip()}
+
+    def write(self, trip: dict, plan: str, seconds: Optional[float], metrics: dict):
+        if self.jsonl:
+            record = {"id": trip["id"], "plan": plan, "seconds": seconds, "metrics": metrics}
+            with open(self.output, "a") as f:
+                f.write(json.dumps(record) + "\n")
+        else:
+            # Write to a temporary name first, a half written file would count as done on resume
+            path = os.path.join(self.output, f"{trip['id']}.md")
+            with open(path + ".tmp", "w") as f:
+                f.write(plan)
+            os.replace(path + ".tmp", path)
+
+
+@dataclass
+class BatchStats:
+    skipped: int = 0
+    failed: list = field(default_factory=list)
+    latencies: list = field(default_factory=list)
+    retries: int = 0
+
+    def summary(self, wall_time: float) -> str:
+        done = len(self.latencies)
+        lines = [
+            f"{done} planned, {len(self.failed)} failed, {self.skipped} skipped, {self.retries} retries in {wall_time:.0f}s"
+            f" ({60 * done / wall_time if wall_time else 0:.1f} plans/min)",
+        ]
+        if self.latencies:
+            latencies = sorted(self.latencies)
+            p95 = latencies[min(len(latencies) - 1, int(0.95 * len(latencies)))]
+            lines.append(f"latency p50 {statistics.median(latencies):.1f}s, p95 {p95:.1f}s, max {latencies[-1]:.1f}s")
+        if self.failed:
+            lines.append("failed ids: " + ", ".join(self.failed))
+        return "\n".join(lines)
+
+
+def batch_thread_id(trip: dict) -> str:
+    """Thread id of a trip's run. It includes a hash of the trip fields, so a later batch that
+    reuses an id for another trip starts a new run instead of getting the old plan."""
+    fields = json.dumps({k: trip.get(k) for k in TRIP_FIELDS}, sort_keys=True, default=str)
+    return f"batch-{trip['id']}-{hashlib.sha256(fields.encode()).hexdigest()[:12]}"
+
+
+async def plan_trip(trip: dict, rate_limiter: Optional[InMemoryRateLimiter], retries: int,
+                    stats: BatchStats, callbacks: list) -> tuple[str, Optional[float], dict]:
+    """(plan, seconds, run metrics) of a trip; seconds is None for a plan of a finished checkpointed run."""
+    app = get_orchestrator()
+    state = {"messages": [HumanMessage(content="Plan my trip")], **{k: trip.get(k) for k in TRIP_FIELDS}}
+    # Retries and restarted batches continue the trip's checkpointed run instead of starting over
+    thread_id = batch_thread_id(trip)
+    for attempt in range(retries + 1):
+        status = run_status(app, thread_id)
+        if status == "finished":
+            result = app.get_state(thread_config(thread_id)).values
+            return extract_ai_text(result["messages"][-1].content), None, {}
+        if rate_limiter is not None:
+            await rate_limiter.aacquire()
+        metrics = RunMetrics()
+        start = time.perf_counter()
+        try:
+            config = budget_config({**thread_config(thread_id), "callbacks": callbacks + [metrics],
+                                    "run_name": f"trip {trip['id']}", "metadata": {"session_id": trip["id"]}})
+            result = await app.ainvoke(None if status == "interrupted" else state, config=config)
+            return extract_ai_text(result["messages"][-1].content), time.perf_counter() - start, metrics.summary()
+        except Exception as error:
+            if attempt == retries or not is_retryable(error):
+                raise
+            stats.retries += 1
+            delay = min(60, 2 ** attempt) * (1 + random.random())
+            print(f"[{trip['id']}] {type(error).__name__}, retrying in {delay:.0f}s", file=sys.stderr)
+            await asyncio.sleep(delay)
+
+
+async def run_batch(trips: list[dict], output: str, concurrency: int = 4, plans_per_minute: Optional[float] = None,
+                    retries: int = 3, callbacks: Optional[list] = None) -> BatchStats:
+    """Plan all trips not yet in `output`, at most `concurrency` at a time.
+
+    `plans_per_minute` caps how many plan attempts (incl. retries) start per minute.
+    """
+    writer = PlanWriter(output)
+    stats = BatchStats()
+    completed = writer.completed_ids()
+    pending = [trip for trip in trips if trip["id"] not in completed]
+    stats.skipped = len(trips) - len(pending)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    rate_limiter = None
+    if plans_per_minute:
+        rate_limiter = InMemoryRateLimiter(requests_per_second=plans_per_minute / 60, check_every_n_seconds=0.1)
+
+    async def run(trip: dict):
+        async with semaphore:
+            try:
+                plan, seconds, metrics = await plan_trip(trip, rate_limiter, retries, stats, callbacks or [])
+            except Exception as error:
+                stats.failed.append(trip["id"])
+                print(f"[{trip['id']}] failed: {type(error).__name__}: {error}", file=sys.stderr)
+                return
+        writer.write(trip, plan, seconds, metrics)
+        if seconds is None:
+            # Planned by an earlier batch that stopped before writing it, not a latency of this one
+            stats.skipped += 1
+            print(f"[{trip['id']}] restored from its checkpoint", file=sys.stderr)
+            return
+        stats.latencies.append(seconds)
+        print(f"[{trip['id']}] done in {seconds:.0f}s ({len(stats.latencies)}/{len(pending)})", file=sys.stderr)
+
+    await asyncio.gather(*(run(trip) for trip in pending))
+    return stats
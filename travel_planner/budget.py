@@ -0,0 +1,81 @@
+"""Per-run budgets for the orchestrator and researcher loops.
+
+Without limits, a confused orchestrator can keep asking for research (or keep answering
+without tool calls) until the recursion limit kills the run, burning the shared rate
+limit on the way. Every run gets a budget of orchestrator turns, search rounds per
+researcher call, working time and tokens. The `budget_usage` state field records what
+the run used. When the run is out of turns, time or tokens, pending research is skipped
+and the orchestrator hands over to the planner with the research gathered so far.
+
+Override per run via config["configurable"]["budget"], e.g. {"max_iterations": 4}.
+"""
+
+import time
+from dataclasses import asdict, dataclass
+from typing import Optional
+
+from langchain_core.runnables import RunnableConfig
+
+
+@dataclass(frozen=True)
+class Budget:
+    # llm_call turns of the orchestrator
+    max_iterations: int = 10
+    # Search rounds of one researcher call
+    max_researcher_steps: int = 5
+    # Time spent in llm_call and tool_call, so a resumed run continues its budget
+    max_seconds: float = 900.0
+    # Orchestrator and researcher tokens, input and output
+    max_tokens: int = 500_000
+
+    @classmethod
+    def from_config(cls, config: Optional[RunnableConfig]) -> "Budget":
+        overrides = ((config or {}).get("configurable") or {}).get("budget") or {}
+        return cls(**{**asdict(cls()), **overrides})
+
+    def exhausted(self, used: dict, iterations: bool = True) -> Optional[str]:
+        """The first budget `used` (see usage) has used up, or None."""
+        if iterations and used["iterations"] >= self.max_iterations:
+            return "iterations"
+        if used["seconds"] >= self.max_seconds:
+            return "time"
+        if used["tokens"] >= self.max_tokens:
+            return "tokens"
+        return None
+
+    def researcher_recursion_limit(self) -> int:
+        # Every search round is an agent and a tools step, plus the final answer
+        return 2 * self.max_researcher_steps + 2
+
+    def graph_recursion_limit(self) -> int:
+        # lookup_plan and prefetch, an llm_call and a tool_call per iteration, the handover's
+        # llm_call and tool_call, compact, planner and cache_plan, and one to spare
+        return 2 * self.max_iterations + 8
+
+
+def budget_config(config: Optional[dict] = None) -> dict:
+    """`config` with the orchestrator graph's recursion_limit for the run's budget, so a run
+    hands over to the planner when it is out of iterations instead of hitting the limit."""
+    return {**(config or {}), "recursion_limit": Budget.from_config(config).graph_recursion_limit()}
+
+
+def usage(state: dict) -> dict:
+    """What the run used so far, from the `budget_usage` state field."""
+    return state.get("budget_usage") or {
+        "iterations": 0, "researcher_steps": 0, "seconds": 0.0, "tokens": 0, "exhausted": None,
+    }
+
+
+def charge(state: dict, budget: Budget, started: float, **amounts) -> dict:
+    """The `budget_usage` state update after a node that started at `started` (perf_counter)."""
+    used = dict(usage(state))
+    used["seconds"] += time.perf_counter() - started
+    for key, amount in amounts.items():
+        used[key] += amount
+    used["limits"] = asdict(budget)
+    return used
+
+
+def message_tokens(message) -> int:
+    usage_metadata = getattr(message, "usage_metadata", None) or {}
+    return usage_metadata.get("total_tokens", 0)
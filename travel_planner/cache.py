@@ -0,0 +1,429 @@
+"""Caches for Tavily search results, researcher answers and whole plans.
+
+Keys are derived from the normalized query text plus the parameters that change the
+answer (search options, trip details). Every entry expires after a TTL that depends on
+its category, e.g. flight prices go stale within the hour while visa rules hold for days.
+
+Plans are cached per destination and also serve near-duplicate trips, e.g. with dates
+shifted by a day or a budget a few percent off. A plan is reused as long as all of its
+research is fresh, otherwise its fresh research is a warm start for a new plan.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Any, Optional
+
+# Time to live in seconds per research category
+DEFAULT_TTLS = {
+    "flights": 60 * 60,
+    "weather": 3 * 60 * 60,
+    "accommodation": 12 * 60 * 60,
+    "activities": 24 * 60 * 60,
+    "logistics": 7 * 24 * 60 * 60,
+    "general": 6 * 60 * 60,
+}
+
+CATEGORY_PATTERNS = {
+    "flights": r"\b(flights?|fly|flying|airlines?|airfares?|airports?)\b",
+    "weather": r"\b(weather|forecast|temperatures?|climate|rain)\b",
+    "accommodation": r"\b(hotels?|hostels?|accommodations?|lodging|airbnb|ryokan|stay)\b",
+    "activities": r"\b(activities|things to do|attractions?|events?|festivals?|museums?|restaurants?|food|tours?)\b",
+    "logistics": r"\b(visas?|passports?|entry requirements?|customs|transport|metro|trains?|currency)\b",
+}
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    text = unicodedata.normalize("NFKC", text).lower()
+    return " ".join(re.sub(r"[^\w]+", " ", text).split())
+
+
+def categorize(text: str, ttls: dict = DEFAULT_TTLS) -> str:
+    """Pick the matching category with the shortest TTL, so mixed questions expire early."""
+    matches = [category for category, pattern in CATEGORY_PATTERNS.items() if re.search(pattern, text, re.IGNORECASE)]
+    if not matches:
+        return "general"
+    return min(matches, key=lambda category: ttls.get(category, ttls["general"]))
+
+
+def make_key(namespace: str, text: str, params: Optional[dict] = None) -> str:
+    params = {k: v for k, v in sorted((params or {}).items()) if v is not None}
+    payload = json.dumps([namespace, normalize_text(text), params], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class MemoryBackend:
+    """In-process LRU store with per-entry expiry."""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.time() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk LRU store, shared by all processes using the same file. Values must be JSON serializable."""
+
+    def __init__(self, path: str, max_entries: int = 10_000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, used_at REAL NOT NULL)"
+            )
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] < now:
+                self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE cache SET used_at = ? WHERE key = ?", (now, key))
+            return json.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, used_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, default=str), now + ttl, now),
+            )
+            self._conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            self._conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM cache")
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+@dataclass
+class CacheStats:
+    hits: dict = field(default_factory=lambda: {"search": 0, "answer": 0})
+    misses: dict = field(default_factory=lambda: {"search": 0, "answer": 0})
+    # Tokens the researcher spent on answers that were later served from the cache
+    tokens_saved: int = 0
+
+    def as_dict(self) -> dict:
+        return {"hits": dict(self.hits), "misses": dict(self.misses), "tokens_saved": self.tokens_saved}
+
+
+class ResearchCache:
+    """Caches Tavily search results ("search") and full researcher answers ("answer")."""
+
+    def __init__(self, backend, ttls: Optional[dict] = None):
+        self.backend = backend
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+
+    def _get(self, namespace: str, key: str) -> Any:
+        value = self.backend.get(key)
+        with self._lock:
+            if value is None:
+                self.stats.misses[namespace] += 1
+            else:
+                self.stats.hits[namespace] += 1
+        return value
+
+    def _ttl(self, text: str) -> float:
+        return self.ttls[categorize(text, self.ttls)]
+
+    def get_search(self, query: str, params: Optional[dict] = None) -> Optional[dict]:
+        return self._get("search", make_key("search", query, params))
+
+    def set_search(self, query: str, params: Optional[dict], result: dict):
+        self.backend.set(make_key("search", query, params), result, self._ttl(query))
+
+    def get_answer(self, question: str, trip: Optional[dict] = None) -> Optional[str]:
+        entry = self._get("answer", make_key("answer", question, trip))
+        if entry is None:
+            return None
+        with self._lock:
+            self.stats.tokens_saved += entry["tokens"]
+        return entry["answer"]
+
+    def set_answer(self, question: str, trip: Optional[dict], answer: str, tokens: int = 0):
+        self.backend.set(make_key("answer", question, trip), {"answer": answer, "tokens": tokens}, self._ttl(question))
+
+
+# Trips this close to a cached one get its plan
+PLAN_DATE_TOLERANCE_DAYS = 1
+PLAN_BUDGET_TOLERANCE = 0.05
+# Newest plans kept per destination, the backend bounds the number of destinations
+PLANS_PER_DESTINATION = 20
+
+
+def _parse_date(value) -> Optional[date]:
+    try:
+        return date.fromisoformat(str(value)) if value else None
+    except ValueError:
+        return None
+
+
+def _normalize_trip(trip: dict) -> dict:
+    return {
+        "home_city": normalize_text(trip.get("home_city") or ""),
+        "destination_city": normalize_text(trip.get("destination_city") or ""),
+        "start_date": _parse_date(trip.get("start_date")),
+        "end_date": _parse_date(trip.get("end_date")),
+        "budget": float(trip["budget"]) if trip.get("budget") not in (None, "") else None,
+        "additional_info": normalize_text(trip.get("additional_info") or ""),
+    }
+
+
+@dataclass
+class PlanMatch:
+    trip: dict
+    plan: str
+    exact: bool
+    age: float
+    # (question, answer, researched_at) of the research that is still within its TTL
+    fresh_research: list
+    stale_questions: list
+
+    @property
+    def fresh(self) -> bool:
+        return not self.stale_questions
+
+
+@dataclass
+class PlanCacheStats:
+    hits: int = 0
+    near_hits: int = 0
+    warm_starts: int = 0
+    misses: int = 0
+    invalidated: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.warm_starts + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "hits": self.hits, "near_hits": self.near_hits, "warm_starts": self.warm_starts,
+            "misses": self.misses, "invalidated": self.invalidated, "hit_rate": self.hit_rate,
+        }
+
+
+class PlanCache:
+    """Finished plans with their research, per destination.
+
+    `hits` count plans served as they are (`near_hits` of those for near-duplicate trips),
+    `warm_starts` lookups where only part of the research was still fresh.
+    """
+
+    def __init__(self, backend, date_tolerance_days: int = PLAN_DATE_TOLERANCE_DAYS,
+                 budget_tolerance: float = PLAN_BUDGET_TOLERANCE, plans_per_destination: int = PLANS_PER_DESTINATION,
+                 ttls: Optional[dict] = None):
+        self.backend = backend
+        self.date_tolerance_days = date_tolerance_days
+        self.budget_tolerance = budget_tolerance
+        self.plans_per_destination = plans_per_destination
+        self.ttls = {**DEFAULT_TTLS, **(ttls or {})}
+        self.stats = PlanCacheStats()
+        self._lock = threading.Lock()
+
+    def _key(self, destination: str) -> str:
+        return make_key("plan", destination)
+
+    def _similar(self, a, b, tolerance: float) -> bool:
+        if a is None or b is None:
+            return a == b
+        return abs(a - b) <= tolerance
+
+    def match(self, cached: dict, trip: dict) -> Optional[bool]:
+        """None if the normalized trips don't match, else whether they are identical."""
+        if cached["home_city"] != trip["home_city"] or cached["additional_info"] != trip["additional_info"]:
+            return None
+        for field_ in ("start_date", "end_date"):
+            a, b = cached[field_], trip[field_]
+            if not self._similar(a and a.toordinal(), b and b.toordinal(), self.date_tolerance_days):
+                return None
+        budget = max(cached["budget"] or 0, trip["budget"] or 0)
+        if not self._similar(cached["budget"], trip["budget"], self.budget_tolerance * budget):
+            return None
+        return cached == trip
+
+    def _entries(self, destination: str) -> list[dict]:
+        return self.backend.get(self._key(destination)) or []
+
+    def lookup(self, trip: dict) -> Optional[PlanMatch]:
+        normalized = _normalize_trip(trip)
+        now = time.time()
+        best = None
+        for entry in self._entries(normalized["destination_city"]):
+            exact = self.match(_normalize_trip(entry["trip"]), normalized)
+            if exact is None:
+                continue
+            age = now - entry["created_at"]
+            fresh = [(q, a, at) for q, a, at in entry["research"] if now - at < self._ttl(q)]
+            stale = [q for q, a, at in entry["research"] if now - at >= self._ttl(q)]
+            if entry["research"] and not fresh:
+                continue
+            # Nothing says how current a plan without research is, it expires like general research
+            if not entry["research"] and age >= self.ttls["general"]:
+                continue
+            match = PlanMatch(entry["trip"], entry["plan"], exact, age, fresh, stale)
+            # Prefer plans that can be served, then identical trips, then the newest
+            rank = (match.fresh, exact, -age)
+            if best is None or rank > best[0]:
+                best = (rank, match)
+
+        with self._lock:
+            if best is None:
+                self.stats.misses += 1
+                return None
+            match = best[1]
+            if match.fresh:
+                self.stats.hits += 1
+                self.stats.near_hits += not match.exact
+            else:
+                self.stats.warm_starts += 1
+        return match
+
+    def _ttl(self, text: str) -> float:
+        return self.ttls[categorize(text, self.ttls)]
+
+    def store(self, trip: dict, plan: str, research: list[tuple[str, str]], researched_at: Optional[dict] = None):
+        """`researched_at` keeps the original time of research reused from an earlier plan, by question."""
+        normalized = _normalize_trip(trip)
+        key = self._key(normalized["destination_city"])
+        now = time.time()
+        max_ttl = max(self.ttls.values())
+        with self._lock:
+            entries = [
+                entry for entry in self._entries(normalized["destination_city"])
+                if now - entry["created_at"] < max_ttl and _normalize_trip(entry["trip"]) != normalized
+            ]
+            entries.append({
+                "trip": {k: trip.get(k) for k in ("home_city", "destination_city", "start_date", "end_date", "budget", "additional_info")},
+                "plan": plan,
+                "research": [[q, a, (researched_at or {}).get(q, now)] for q, a in research],
+                "created_at": now,
+            })
+            self.backend.set(key, entries[-self.plans_per_destination:], max_ttl)
+
+    def invalidate(self, destination: str) -> int:
+        """Drop all plans for a destination, returns how many there were."""
+        with self._lock:
+            removed = len(self._entries(normalize_text(destination)))
+            self.backend.delete(self._key(normalize_text(destination)))
+            self.stats.invalidated += removed
+        return removed
+
+
+def cache_from_env() -> Optional[ResearchCache]:
+    """TRAVEL_PLANNER_CACHE: "memory" (default), "off", or the path of a SQLite file."""
+    setting = os.getenv("TRAVEL_PLANNER_CACHE", "memory")
+    if setting == "off":
+        return None
+    if setting == "memory":
+        return ResearchCache(MemoryBackend())
+    return ResearchCache(SQLiteBackend(setting))
+
+
+_UNSET = object()
+_research_cache: Any = _UNSET
+
+
+def get_research_cache() -> Optional[ResearchCache]:
+    """The process-wide cache, configured from the environment on first use."""
+    global _research_cache
+    if _research_cache is _UNSET:
+        _research_cache = cache_from_env()
+    return _research_cache
+
+
+def set_research_cache(cache: Optional[ResearchCache]):
+    """Swap the process-wide cache, None disables caching."""
+    global _research_cache
+    _research_cache = cache
+
+
+def plan_cache_from_env() -> Optional[PlanCache]:
+    """TRAVEL_PLANNER_PLAN_CACHE: "memory" (default), "off", or the path of a SQLite file.
+
+    Tolerances: TRAVEL_PLANNER_PLAN_DATE_TOLERANCE (days) and TRAVEL_PLANNER_PLAN_BUDGET_TOLERANCE (fraction).
+    """
+    setting = os.getenv("TRAVEL_PLANNER_PLAN_CACHE", "memory")
+    if setting == "off":
+        return None
+    backend = MemoryBackend(max_entries=256) if setting == "memory" else SQLiteBackend(setting)
+    return PlanCache(
+        backend,
+        date_tolerance_days=int(os.getenv("TRAVEL_PLANNER_PLAN_DATE_TOLERANCE", PLAN_DATE_TOLERANCE_DAYS)),
+        budget_tolerance=float(os.getenv("TRAVEL_PLANNER_PLAN_BUDGET_TOLERANCE", PLAN_BUDGET_TOLERANCE)),
+    )
+
+
+_plan_cache: Any = _UNSET
+
+
+def get_plan_cache() -> Optional[PlanCache]:
+    """The process-wide plan cache, configured from the environment on first use."""
+    global _plan_cache
+    if _plan_cache is _UNSET:
+        _plan_cache = plan_cache_from_env()
+    return _plan_cache
+
+
+def set_plan_cache(cache: Optional[PlanCache]):
+    """Swap the process-wide plan cache, None disables it."""
+    global _plan_cache
+    _plan_cache = cache
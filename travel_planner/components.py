@@ -0,0 +1,182 @@
+"""The models and tools of the agents, built on first use.
+
+Constructing them means importing langchain_anthropic and langchain_tavily, most of the
+startup time of the CLI and the app, so the agent modules don't do it at import time.
+They ask the process-wide `Components` for a part when a node first needs it, and it
+builds the part from one `Settings` object.
+
+Parts can be swapped before they are built, e.g. for fakes in benchmarks or another model:
+
+    set_components(Components(planner_model=my_chat_model))
+
+Parts:
+- orchestrator_model, researcher_model, planner_model: the chat model of each agent,
+  wrapped in ScheduledChatModel. Agents with the same model name share one client.
+- model_with_tools: orchestrator_model with the orchestrator's tools bound.
+- search_tool: the Tavily search of the researcher.
+- researcher: the researcher's ReAct agent over researcher_model and search_tool.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Callable, Optional
+
+ROLES = ("orchestrator", "researcher", "planner")
+
+
+@lru_cache(maxsize=None)
+def load_env() -> bool:
+    """Load .env into the environment, once per process."""
+    from dotenv import load_dotenv
+
+    return load_dotenv()
+
+
+@dataclass(frozen=True)
+class Settings:
+    # Anthropic model of every agent without a model of its own
+    model: str = "claude-sonnet-4-5"
+    temperature: float = 0.0
+    orchestrator_model: Optional[str] = None
+    researcher_model: Optional[str] = None
+    planner_model: Optional[str] = None
+    search_max_results: int = 5
+    search_topic: str = "general"
+    # Anthropic prompt-cache breakpoints on the agents' model input, see prompt_cache
+    prompt_cache: bool = True
+    # Research the standard topics before the first orchestrator turn, see orchestrator.prefetch.
+    # Can be overridden per run via config["configurable"]["prefetch"].
+    prefetch: bool = False
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        """TRAVEL_PLANNER_MODEL, TRAVEL_PLANNER_<ROLE>_MODEL, TRAVEL_PLANNER_SEARCH_MAX_RESULTS,
+        TRAVEL_PLANNER_PROMPT_CACHE ("off" to turn it off) and TRAVEL_PLANNER_PREFETCH ("on" to
+        turn it on), .env included."""
+        load_env()
+        return cls(
+            model=os.getenv("TRAVEL_PLANNER_MODEL", cls.model),
+            **{f"{role}_model": os.getenv(f"TRAVEL_PLANNER_{role.upper()}_MODEL") for role in ROLES},
+            search_max_results=int(os.getenv("TRAVEL_PLANNER_SEARCH_MAX_RESULTS", cls.search_max_results)),
+            prompt_cache=os.getenv("TRAVEL_PLANNER_PROMPT_CACHE", "on") != "off",
+            prefetch=os.getenv("TRAVEL_PLANNER_PREFETCH", "off") == "on",
+        )
+
+    def model_for(self, role: str) -> str:
+        return getattr(self, f"{role}_model") or self.model
+
+
+def _chat_model(components: "Components", role: str):
+    name = components.settings.model_for(role)
+    return components.get(f"chat_model:{name}")
+
+
+def _anthropic_model(components: "Components", name: str):
+    from langchain_anthropic import ChatAnthropic
+
+    from travel_planner.scheduler import ScheduledChatModel
+
+    return ScheduledChatModel(model=ChatAnthropic(model=name, temperature=components.settings.temperature))
+
+
+def _model_with_tools(components: "Components"):
+    from travel_planner.agents.orchestrator import TOOLS
+
+    return components.get("orchestrator_model").bind_tools(TOOLS)
+
+
+def _search_tool(components: "Components"):
+    from travel_planner.agents.search import CachedTavilySearch
+
+    return CachedTavilySearch(max_results=components.settings.search_max_results, topic=components.settings.search_topic)
+
+
+def _researcher(components: "Components"):
+    from langgraph.prebuilt import create_react_agent
+
+    from travel_planner.prompt_cache import add_breakpoints
+
+    return create_react_agent(
+        components.get("researcher_model"),
+        [components.get("search_tool")],
+        # Every search round resends the question and the results so far
+        prompt=(lambda state: add_breakpoints(state["messages"])) if components.settings.prompt_cache else None,
+        # Researcher calls run concurrently inside one orchestrator step, their inner
+        # steps aren't worth checkpointing (finished answers are in the research cache)
+        checkpointer=False,
+    )
+
+
+BUILDERS: dict[str, Callable[["Components"], Any]] = {
+    **{f"{role}_model": (lambda components, role=role: _chat_model(components, role)) for role in ROLES},
+    "model_with_tools": _model_with_tools,
+    "search_tool": _search_tool,
+    "researcher": _researcher,
+}
+
+
+class Components:
+    """Builds each part once, on first `get`, unless it was passed in."""
+
+    def __init__(self, settings: Optional[Settings] = None, **parts):
+        self._settings = settings
+        self._parts = {}
+        # Names of the parts passed in, the others were built
+        self._given = set()
+        self._lock = threading.RLock()
+        self.override(**parts)
+
+    @property
+    def settings(self) -> Settings:
+        with self._lock:
+            if self._settings is None:
+                self._settings = Settings.from_env()
+            return self._settings
+
+    def get(self, name: str) -> Any:
+        part = self._parts.get(name)
+        if part is not None:
+            return part
+        with self._lock:
+            if name not in self._parts:
+                if name.startswith("chat_model:"):
+                    self._parts[name] = _anthropic_model(self, name.split(":", 1)[1])
+                elif name in BUILDERS:
+                    self._parts[name] = BUILDERS[name](self)
+                else:
+                    raise KeyError(f"Unknown component {name!r}")
+            return self._parts[name]
+
+    def override(self, **parts):
+        """Use these parts instead of building them. Parts built from them are rebuilt."""
+        unknown = set(parts) - set(BUILDERS)
+        if unknown:
+            raise KeyError(f"Unknown components {sorted(unknown)}")
+        with self._lock:
+            # Built parts may be built from the new ones (model_with_tools of orchestrator_model)
+            for name in set(self._parts) - self._given:
+                del self._parts[name]
+            self._parts.update(parts)
+            self._given.update(parts)
+
+
+_components: Optional[Components] = None
+_components_lock = threading.Lock()
+
+
+def get_components() -> Components:
+    """The process-wide components, configured from the environment on first use."""
+    global _components
+    with _components_lock:
+        if _components is None:
+            _components = Components()
+        return _components
+
+
+def set_components(components: Components):
+    """Swap the process-wide components, e.g. for fakes or other models."""
+    global _components
+    with _components_lock:
+        _components = components
@@ -0,0 +1,29 @@
+"""Incremental Markdown export of a plan that is still being written."""
+
+from typing import TextIO
+
+
+class SectionWriter:
+    """Writes streamed Markdown to a file, one complete section at a time.
+
+    Text is buffered until the next heading starts, so a reader (an editor, `tail -f`,
+    a Markdown preview) always sees whole sections of the plan, never half a table row.
+    """
+
+    def __init__(self, file: TextIO):
+        self.file = file
+        self._buffer = ""
+
+    def write(self, text: str):
+        self._buffer += text
+        # Everything before the last heading is complete
+        cut = max(self._buffer.rfind("\n#"), 0)
+        if cut:
+            self.file.write(self._buffer[:cut + 1])
+            self.file.flush()
+            self._buffer = self._buffer[cut + 1:]
+
+    def close(self):
+        self.file.write(self._buffer)
+        self.file.flush()
+        self._buffer = ""
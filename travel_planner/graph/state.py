@@ -9,4 +9,17 @@ class OrchestratorState(MessagesState):
     budget: Optional[float] = None
     additional_info: Optional[str] = None
     
-    is_finished: Optional[bool] = None
\ No newline at end of file
+    is_finished: Optional[bool] = None
+
+    # Compacted research for the planner, see agents/compactor.py
+    research_brief: Optional[str] = None
+    compaction: Optional[dict] = None
+
+    # The cached plan of a similar trip this run served or started from, see cache.PlanCache
+    cached_plan: Optional[dict] = None
+
+    # Researcher calls answered by earlier or merged research, see agents/research_planner.py
+    research_dedup: Optional[dict] = None
+
+    # What the run used of its budget, see budget.py
+    budget_usage: Optional[dict] = None
@@ -0,0 +1,344 @@
+"""Local latency and token instrumentation for orchestrator runs.
+
+`RunMetrics` is a callback handler, passed per invocation next to the Langfuse one. It
+records a span per graph node, LLM call and tool run, and summarizes them into where the
+time and tokens of a plan went: the orchestrator's llm_call turns, every call_researcher
+with its inner ReAct steps and Tavily searches, and the planner incl. time to first token.
+
+Finished runs are also added to the process-wide `registry`, which renders
+Prometheus-style counters and histograms.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from travel_planner.prompt_cache import cache_usage
+
+GRAPH_NODES = ("lookup_plan", "prefetch", "llm_call", "tool_call", "compact", "planner", "cache_plan")
+
+
+@dataclass
+class Span:
+    kind: str  # "node", "llm" or "tool"
+    name: str
+    stage: str
+    start: float
+    end: Optional[float] = None
+    tool_call_id: Optional[str] = None
+    input: Optional[str] = None
+    first_token: Optional[float] = None
+    input_tokens: int = 0
+    output_tokens: int = 0
+    # Part of input_tokens read from / written to Anthropic's prompt cache
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+
+    @property
+    def seconds(self) -> float:
+        return (self.end or time.perf_counter()) - self.start
+
+    @property
+    def ttft(self) -> Optional[float]:
+        return self.first_token - self.start if self.first_token else None
+
+
+def _cache_tokens(spans: list[Span]) -> dict:
+    return {
+        "cache_read_tokens": sum(s.cache_read_tokens for s in spans),
+        "cache_write_tokens": sum(s.cache_write_tokens for s in spans),
+    }
+
+
+def _stage(metadata: dict) -> str:
+    """The part of the plan a run belongs to: a top-level node, or research for anything nested in call_researcher."""
+    if metadata.get("orchestrator_tool_call_id"):
+        return "research"
+    return metadata.get("langgraph_node", "")
+
+
+class RunMetrics(BaseCallbackHandler):
+    """Collects spans of one orchestrator invocation."""
+
+    # Cheap bookkeeping, run it in the calling thread to keep timestamps accurate
+    run_inline = True
+
+    def __init__(self, registry: Optional["MetricsRegistry"] = None):
+        """Finished runs are recorded in `registry`, the process-wide one by default."""
+        self.registry = registry
+        self.spans: dict[UUID, Span] = {}
+        self.root_run_id: Optional[UUID] = None
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Researcher calls that didn't run, see agents/research_planner.py
+        self.research_reused = 0
+        self._lock = threading.Lock()
+
+    def _start(self, run_id: UUID, span: Span):
+        with self._lock:
+            self.spans[run_id] = span
+
+    def _end(self, run_id: UUID) -> Optional[Span]:
+        span = self.spans.get(run_id)
+        if span is not None:
+            span.end = time.perf_counter()
+        return span
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, metadata=None, **kwargs):
+        metadata = metadata or {}
+        if parent_run_id is None and self.root_run_id is None:
+            self.root_run_id = run_id
+            self.started = time.perf_counter()
+        node = metadata.get("langgraph_node")
+        # Node runs are the chains named like their node; nested researcher nodes count as research.
+        # Nodes with an async implementation have an inner run of the same name, count the outer one.
+        parent = self.spans.get(parent_run_id)
+        if parent is not None and parent.kind == "node" and parent.name == node:
+            return
+        if node and kwargs.get("name") == node and not metadata.get("orchestrator_tool_call_id"):
+            self._start(run_id, Span("node", node, node, time.perf_counter()))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+        if run_id == self.root_run_id:
+            self.finished = time.perf_counter()
+            (self.registry or registry).record(self)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self.on_chain_end(None, run_id=run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        metadata = metadata or {}
+        self._start(run_id, Span(
+            "llm", kwargs.get("name") or "chat_model", _stage(metadata), time.perf_counter(),
+            tool_call_id=metadata.get("orchestrator_tool_call_id"),
+        ))
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        span = self.spans.get(run_id)
+        if span is not None and span.first_token is None and token:
+            span.first_token = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        span = self._end(run_id)
+        if span is None:
+            return
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                usage = getattr(message, "usage_metadata", None) or {}
+                span.input_tokens += usage.get("input_tokens", 0)
+                span.output_tokens += usage.get("output_tokens", 0)
+                read, written = cache_usage(message)
+                span.cache_read_tokens += read
+                span.cache_write_tokens += written
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, inputs=None, **kwargs):
+        metadata = metadata or {}
+        name = kwargs.get("name") or (serialized or {}).get("name", "tool")
+        if name != "call_researcher" and "tavily" not in name.lower():
+            return
+        if inputs:
+            input_str = inputs.get("question") or inputs.get("query") or input_str
+        self._start(run_id, Span(
+            "tool", name, "research", time.perf_counter(),
+            tool_call_id=metadata.get("orchestrator_tool_call_id"), input=input_str,
+        ))
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_custom_event(self, name, data, *, run_id, **kwargs):
+        if name == "research_reused":
+            with self._lock:
+                self.research_reused += 1
+
+    @property
+    def wall_time(self) -> float:
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    def summary(self) -> dict[str, Any]:
+        """Wall time and tokens per stage, per researcher call and for the planner."""
+        spans = list(self.spans.values())
+        stages = {}
+        for node in GRAPH_NODES:
+            node_spans = [s for s in spans if s.kind == "node" and s.name == node]
+            llm_spans = [s for s in spans if s.kind == "llm" and s.stage == node]
+            if node_spans:
+                stages[node] = {
+                    "count": len(node_spans),
+                    "seconds": sum(s.seconds for s in node_spans),
+                    "input_tokens": sum(s.input_tokens for s in llm_spans),
+                    "output_tokens": sum(s.output_tokens for s in llm_spans),
+                    **_cache_tokens(llm_spans),
+                }
+        planner_llm = [s for s in spans if s.kind == "llm" and s.stage == "planner"]
+        if "planner" in stages and planner_llm and planner_llm[0].ttft is not None:
+            stages["planner"]["ttft"] = planner_llm[0].ttft
+
+        research = []
+        for span in sorted((s for s in spans if s.name == "call_researcher"), key=lambda s: s.start):
+            nested = [s for s in spans if s.tool_call_id == span.tool_call_id and s is not span]
+            steps = [s for s in nested if s.kind == "llm"]
+            searches = [s for s in nested if s.kind == "tool"]
+            research.append({
+                "tool_call_id": span.tool_call_id,
+                "question": span.input,
+                "seconds": span.seconds,
+                "llm_steps": len(steps),
+                "input_tokens": sum(s.input_tokens for s in steps),
+                "output_tokens": sum(s.output_tokens for s in steps),
+                **_cache_tokens(steps),
+                "searches": [{"query": s.input, "seconds": s.seconds} for s in searches],
+            })
+
+        llm_spans = [s for s in spans if s.kind == "llm"]
+        # Searches avoided are estimated from the researcher calls that did run
+        searches_per_run = sum(len(r["searches"]) for r in research) / len(research) if research else 0.0
+        return {
+            "wall_time": self.wall_time,
+            "stages": stages,
+            "research": research,
+            "research_avoided": {"runs": self.research_reused, "searches": round(self.research_reused * searches_per_run)},
+            "input_tokens": sum(s.input_tokens for s in llm_spans),
+            "output_tokens": sum(s.output_tokens for s in llm_spans),
+            **_cache_tokens(llm_spans),
+            # Input tokens of every model call, in order
+            "calls": [
+                {"stage": s.stage, "input_tokens": s.input_tokens, "cache_read_tokens": s.cache_read_tokens,
+                 "cache_write_tokens": s.cache_write_tokens, "output_tokens": s.output_tokens}
+                for s in sorted(llm_spans, key=lambda s: s.start)
+            ],
+        }
+
+    def write_jsonl(self, path: str, run_name: str = ""):
+        with open(path, "a") as f:
+            f.write(self.to_jsonl(run_name))
+
+    def to_jsonl(self, run_name: str = "") -> str:
+        """One JSON object per span, times relative to the start of the run."""
+        origin = self.started or 0.0
+        lines = []
+        for run_id, span in sorted(self.spans.items(), key=lambda item: item[1].start):
+            record = asdict(span)
+            record.update(run=run_name, run_id=str(run_id), start=span.start - origin, seconds=span.seconds, ttft=span.ttft)
+            record.pop("end")
+            record.pop("first_token")
+            lines.append(json.dumps(record))
+        return "\n".join(lines) + "\n"
+
+
+def format_summary(summary: dict[str, Any]) -> str:
+    """Plain-text table of a RunMetrics summary, for the CLI."""
+    lines = [f"Total: {summary['wall_time']:.1f}s, {summary['input_tokens']} input / {summary['output_tokens']} output tokens"]
+    if summary.get("cache_read_tokens") or summary.get("cache_write_tokens"):
+        uncached = summary["input_tokens"] - summary["cache_read_tokens"] - summary["cache_write_tokens"]
+        lines[0] += (f" (input: {summary['cache_read_tokens']} cached, {summary['cache_write_tokens']} written to cache, "
+                     f"{uncached} uncached)")
+    for stage, data in summary["stages"].items():
+        line = f"  {stage:10} {data['count']:3}x {data['seconds']:7.1f}s  {data['input_tokens']:7} in {data['output_tokens']:6} out"
+        if data.get("cache_read_tokens"):
+            line += f"  {data['cache_read_tokens']} in cached"
+        if "ttft" in data:
+            line += f"  first token after {data['ttft']:.1f}s"
+        lines.append(line)
+    for research in summary["research"]:
+        question = (research["question"] or "")[:60]
+        cached = f" ({research['cache_read_tokens']} cached)" if research.get("cache_read_tokens") else ""
+        lines.append(
+            f"  research   {research['seconds']:7.1f}s  {research['llm_steps']} steps, {len(research['searches'])} searches, "
+            f"{research['input_tokens']} in{cached} {research['output_tokens']} out  {question}"
+        )
+    avoided = summary.get("research_avoided", {})
+    if avoided.get("runs"):
+        lines.append(f"  avoided    {avoided['runs']} researcher runs (~{avoided['searches']} searches) for overlapping questions")
+    return "\n".join(lines)
+
+
+# Upper bounds in seconds
+HISTOGRAM_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+@dataclass
+class Histogram:
+    buckets: list = field(default_factory=lambda: [0] * len(HISTOGRAM_BUCKETS))
+    count: int = 0
+    sum: float = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(HISTOGRAM_BUCKETS):
+            if value <= bound:
+                self.buckets[i] += 1
+
+
+class MetricsRegistry:
+    """Process-wide aggregation of finished runs, rendered in the Prometheus text format."""
+
+    def __init__(self):
+        self.counters: dict[tuple, float] = defaultdict(float)
+        self.histograms: dict[tuple, Histogram] = defaultdict(Histogram)
+        self._lock = threading.Lock()
+
+    def record(self, metrics: RunMetrics):
+        summary = metrics.summary()
+        with self._lock:
+            self.counters[("travel_planner_runs_total", ())] += 1
+            self.histograms[("travel_planner_run_seconds", ())].observe(summary["wall_time"])
+            for stage, data in summary["stages"].items():
+                labels = (("stage", stage),)
+                self.histograms[("travel_planner_stage_seconds", labels)].observe(data["seconds"])
+                if not data["input_tokens"] and not data["output_tokens"]:
+                    continue
+                self.counters[("travel_planner_tokens_total", labels + (("type", "input"),))] += data["input_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "output"),))] += data["output_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "cache_read"),))] += data["cache_read_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "cache_write"),))] += data["cache_write_tokens"]
+            if "ttft" in summary["stages"].get("planner", {}):
+                self.histograms[("travel_planner_planner_ttft_seconds", ())].observe(summary["stages"]["planner"]["ttft"])
+            for research in summary["research"]:
+                labels = (("stage", "research"),)
+                self.histograms[("travel_planner_research_seconds", ())].observe(research["seconds"])
+                self.counters[("travel_planner_tokens_total", labels + (("type", "input"),))] += research["input_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "output"),))] += research["output_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "cache_read"),))] += research["cache_read_tokens"]
+                self.counters[("travel_planner_tokens_total", labels + (("type", "cache_write"),))] += research["cache_write_tokens"]
+                self.counters[("travel_planner_searches_total", ())] += len(research["searches"])
+                for search in research["searches"]:
+                    self.histograms[("travel_planner_search_seconds", ())].observe(search["seconds"])
+            if summary["research_avoided"]["runs"]:
+                self.counters[("travel_planner_research_avoided_total", ())] += summary["research_avoided"]["runs"]
+
+    def render_prometheus(self) -> str:
+        def fmt(labels) -> str:
+            return "{" + ",".join(f'{k}="{v}"' for k, v in labels) + "}" if labels else ""
+
+        lines = []
+        with self._lock:
+            for (name, labels), value in sorted(self.counters.items()):
+                lines.append(f"{name}{fmt(labels)} {value:g}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                for bound, count in zip(HISTOGRAM_BUCKETS, histogram.buckets):
+                    lines.append(f"{name}_bucket{fmt(labels + (('le', f'{bound:g}'),))} {count}")
+                lines.append(f"{name}_bucket{fmt(labels + (('le', '+Inf'),))} {histogram.count}")
+                lines.append(f"{name}_sum{fmt(labels)} {histogram.sum:g}")
+                lines.append(f"{name}_count{fmt(labels)} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
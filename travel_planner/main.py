@@ -1,25 +1,191 @@
-from dotenv import load_dotenv
+import argparse
+import asyncio
+import os
+import sys
+import time
 
-load_dotenv()
+from travel_planner.components import load_env
+from travel_planner.export import SectionWriter
+from travel_planner.progress import ProgressItem, ProgressTracker, extract_ai_text, stream_progress
 
-from langfuse.langchain import CallbackHandler
-from langchain_core.messages import HumanMessage
-from travel_planner.agents.orchestrator import orchestrator_builder
+# The agents, Langfuse and the graph are imported by the commands that need them, so
+# `--help` and invalidate-plans don't wait for them
+
+EXAMPLE_TRIP = {
+    "home_city": "Munich",
+    "destination_city": "Tokyo",
+    "start_date": "2026-02-01",
+    "end_date": "2026-02-03",
+    "budget": 2000.0,
+    "additional_info": "I love Japanese food"
+}
+
+def render_item(item: ProgressItem):
+    """One line per research call instead of its whole answer, the plan is what matters."""
+    if item.type == "ai":
+        print(f"\n{item.content}\n", file=sys.stderr)
+    elif item.done:
+        print(f"  ✓ {item.content} ({len(item.sub_steps)} searches)", file=sys.stderr)
+    else:
+        print(f"  → {item.content}", file=sys.stderr)
+
+async def stream_plan(app, state, config: dict, quiet: bool, output) -> ProgressTracker:
+    """Writes planner tokens to stdout (and whole sections to output) as they arrive."""
+    tracker = ProgressTracker()
+    rendered = set()
+    status = None
+    streamed = False
+    async for progress in stream_progress(app, state, config, tracker):
+        text = progress.plan_token
+        if text is not None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
+            if output is not None:
+                output.write(text)
+            streamed = True
+        for update in progress.updates:
+            if update.kind == "plan_ready" and not streamed:
+                # Served from the plan cache, nothing was streamed
+                print(update.text)
+                if output is not None:
+                    output.write(update.text)
+            if quiet:
+                continue
+            if update.kind == "status" and update.text != status:
+                status = update.text
+                print(status, file=sys.stderr)
+            elif update.kind == "item":
+                item = tracker.items[update.index]
+                # Researcher calls are rendered when they start and when they finish
+                key = (update.index, item.done)
+                if key not in rendered:
+                    rendered.add(key)
+                    render_item(item)
+    if streamed:
+        print()
+    return tracker
+
+def plan_example(args: argparse.Namespace):
+    from langchain_core.messages import HumanMessage
+    from langfuse.langchain import CallbackHandler
+    from travel_planner.agents.orchestrator import get_orchestrator
+    from travel_planner.budget import budget_config
+    from travel_planner.instrumentation import RunMetrics, format_summary
+    from travel_planner.persistence import new_thread_id, run_status, thread_config
 
-def main():
     langfuse_handler = CallbackHandler()
-    app = orchestrator_builder.compile().with_config(config={"callbacks": [langfuse_handler]})
-    messages = app.invoke({
-        "messages": [HumanMessage(content="Plan my trip")],
-        "home_city": "Munich",
-        "destination_city": "Tokyo",
-        "start_date": "2026-02-01",
-        "end_date": "2026-02-03",
-        "budget": 2000.0,
-        "additional_info": "I love Japanese food"
-    })
-    for m in messages["messages"]:
-        m.pretty_print()
+    metrics = RunMetrics()
+    app = get_orchestrator()
+    thread_id = args.thread_id or new_thread_id()
+    config = budget_config({**thread_config(thread_id), "callbacks": [langfuse_handler, metrics]})
+    log = (lambda *a: None) if args.quiet else (lambda *a: print(*a, file=sys.stderr))
+
+    status = run_status(app, thread_id)
+    if status == "finished":
+        # Nothing left to run, show the stored result without calling any model
+        log(f"Thread {thread_id} already finished, showing the stored plan")
+        messages = app.get_state(config).values["messages"]
+        if args.quiet or args.stream:
+            print(extract_ai_text(messages[-1].content))
+        else:
+            for m in messages:
+                m.pretty_print()
+        return
+    if status == "interrupted":
+        log(f"Resuming thread {thread_id} after its last completed step")
+    elif app.checkpointer is not None:
+        log(f"Thread {thread_id} (resume with --thread-id {thread_id})")
+
+    state = None if status == "interrupted" else {"messages": [HumanMessage(content="Plan my trip")], **EXAMPLE_TRIP}
+    output = open(args.plan_output, "w", encoding="utf-8") if args.plan_output else None
+    writer = SectionWriter(output) if args.stream and output is not None else None
+    try:
+        if args.stream:
+            asyncio.run(stream_plan(app, state, config, args.quiet, writer))
+        else:
+            messages = app.invoke(state, config=config)["messages"]
+            if args.quiet:
+                print(extract_ai_text(messages[-1].content))
+            else:
+                for m in messages:
+                    m.pretty_print()
+            if output is not None:
+                output.write(extract_ai_text(messages[-1].content))
+    finally:
+        # Also on errors and Ctrl-C, the section being written is all of the plan there is
+        if writer is not None:
+            writer.close()
+        if output is not None:
+            output.close()
+
+    if not args.quiet:
+        # stderr when streaming, so stdout is just the plan
+        print(format_summary(metrics.summary()), file=sys.stderr if args.stream else sys.stdout)
+    if os.getenv("TRAVEL_PLANNER_METRICS_FILE"):
+        metrics.write_jsonl(os.environ["TRAVEL_PLANNER_METRICS_FILE"], run_name="Munich-Tokyo")
+
+def plan_batch(args: argparse.Namespace):
+    from langfuse.langchain import CallbackHandler
+    from travel_planner.batch import read_trips, run_batch
+
+    trips = read_trips(args.trips)
+    start = time.perf_counter()
+    stats = asyncio.run(run_batch(
+        trips,
+        args.batch_output,
+        concurrency=args.concurrency,
+        plans_per_minute=args.plans_per_minute,
+        retries=args.retries,
+        callbacks=[CallbackHandler()],
+    ))
+    print(stats.summary(time.perf_counter() - start))
+
+def invalidate_plans(args: argparse.Namespace):
+    from travel_planner.cache import MemoryBackend, get_plan_cache
+
+    cache = get_plan_cache()
+    if cache is None:
+        print("The plan cache is turned off", file=sys.stderr)
+        return
+    if isinstance(cache.backend, MemoryBackend):
+        # This process' cache is empty, the plans live in the server or UI process
+        print("The plan cache is in memory (TRAVEL_PLANNER_PLAN_CACHE=memory), so each process has its own. "
+              "Use DELETE /plans/cache/<destination> of the server, or a SQLite plan cache.", file=sys.stderr)
+        sys.exit(1)
+    removed = sum(cache.invalidate(destination) for destination in args.destinations)
+    print(f"Removed {removed} cached plans")
+
+def main():
+    parser = argparse.ArgumentParser(prog="travel-planner", description="Plan trips with the travel planner agents.")
+    parser.add_argument("--thread-id", help="Resume (or show) the checkpointed run with this id")
+    parser.add_argument("--stream", action="store_true", help="Print the plan as it is written, with one line per research call")
+    parser.add_argument("-o", "--output", dest="plan_output", help="Also write the plan to this Markdown file (section by section with --stream)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print the plan")
+    subparsers = parser.add_subparsers(dest="command")
+    batch = subparsers.add_parser("batch", help="Plan all trips of a JSONL or CSV file")
+    batch.add_argument("trips", help="JSONL or CSV file with an id and the trip fields per record")
+    batch.add_argument("-o", "--output", dest="batch_output", default="plans", help="Directory for <id>.md files, or a .jsonl file (default: plans)")
+    batch.add_argument("-c", "--concurrency", type=int, default=4, help="Plans running at the same time (default: 4)")
+    batch.add_argument("--plans-per-minute", type=float, help="Limit on plan attempts started per minute")
+    batch.add_argument("--retries", type=int, default=3, help="Retries per trip on provider errors (default: 3)")
+    invalidate = subparsers.add_parser("invalidate-plans", help="Drop the cached plans of destinations")
+    invalidate.add_argument("destinations", nargs="+")
+    serve = subparsers.add_parser("serve", help="Run the HTTP API (plans as jobs, progress over Server-Sent Events)")
+    serve.add_argument("--host", default="127.0.0.1")
+    serve.add_argument("--port", type=int, default=8000)
+    args = parser.parse_args()
+    load_env()
+
+    if args.command == "batch":
+        plan_batch(args)
+    elif args.command == "invalidate-plans":
+        invalidate_plans(args)
+    elif args.command == "serve":
+        from travel_planner.server import serve as run_server
+
+        run_server(args.host, args.port)
+    else:
+        plan_example(args)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
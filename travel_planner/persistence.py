@@ -0,0 +1,219 @@
+"""Durable orchestrator runs: SQLite checkpoints per thread and a store of progress events.
+
+With a checkpointer, LangGraph saves the OrchestratorState after every node under the
+thread_id of the run. Invoking the graph again with `None` as input and the same
+thread_id continues after the last completed node, so a refresh, rerun or provider
+timeout doesn't throw away the research that already finished.
+
+The UI also records its progress events per thread, so the transcript of a finished or
+interrupted run can be rebuilt without calling any model.
+
+TRAVEL_PLANNER_CHECKPOINTS: path of the SQLite file (default "checkpoints.sqlite"),
+"memory" to keep checkpoints and events for the current process only, or "off".
+TRAVEL_PLANNER_RETENTION_DAYS: threads without activity for this many days (default 30)
+are deleted, checkpoints and events, when a process first opens the file. "off" keeps
+them forever.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Optional
+
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+DEFAULT_PATH = "checkpoints.sqlite"
+DEFAULT_RETENTION_DAYS = 30
+
+# The events ProgressTracker folds into the transcript, everything else isn't worth storing.
+# Planner tokens are left out too, the final plan arrives with on_chat_model_end.
+RECORDED_EVENTS = {"on_chat_model_start", "on_chat_model_end", "on_tool_start", "on_tool_end", "on_custom_event"}
+
+
+class SqliteCheckpointer(SqliteSaver):
+    """SqliteSaver that also serves async runs, by doing its (short) queries in a worker thread.
+
+    AsyncSqliteSaver binds its connection to one event loop, while app.py starts a new
+    loop for every run, so one saver for invoke, ainvoke and astream_events is simpler.
+    """
+
+    async def aget_tuple(self, config):
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        checkpoints = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for checkpoint in checkpoints:
+            yield checkpoint
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return await asyncio.to_thread(self.put, config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return await asyncio.to_thread(self.put_writes, config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def setup(self):
+        if self.is_setup:
+            return
+        super().setup()
+        # When each thread last saved a checkpoint, for retention
+        with self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS thread_activity (thread_id TEXT PRIMARY KEY, updated_at REAL NOT NULL)")
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        result = super().put(config, checkpoint, metadata, new_versions)
+        with self.cursor() as cur:
+            cur.execute(
+                "INSERT INTO thread_activity (thread_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (str(config["configurable"]["thread_id"]), time.time()),
+            )
+        return result
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM thread_activity WHERE thread_id = ?", (str(thread_id),))
+
+    def prune(self, before: float) -> int:
+        """Delete the threads whose last checkpoint is older than `before` (a timestamp), returns how many."""
+        with self.cursor(transaction=False) as cur:
+            threads = [row[0] for row in cur.execute("SELECT thread_id FROM thread_activity WHERE updated_at < ?", (before,))]
+        for thread_id in threads:
+            self.delete_thread(thread_id)
+        return len(threads)
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if path != ":memory:":
+        # Readers (e.g. a replay) don't block the writing run
+        conn.execute("PRAGMA journal_mode=WAL")
+    return conn
+
+
+class EventStore:
+    """Progress events of every run, in order, per thread_id."""
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.serde = JsonPlusSerializer()
+        self._lock = threading.Lock()
+        self._conn = _connect(path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS events ("
+                "thread_id TEXT NOT NULL, seq INTEGER NOT NULL, type TEXT NOT NULL, event BLOB NOT NULL, "
+                "created_at REAL NOT NULL, PRIMARY KEY (thread_id, seq))"
+            )
+
+    def append(self, thread_id: str, event: dict[str, Any]):
+        if event["event"] not in RECORDED_EVENTS:
+            return
+        record = {key: event.get(key) for key in ("event", "name", "run_id", "parent_ids", "metadata", "data")}
+        if event["event"] == "on_chat_model_start":
+            # The input is the whole message history, nothing the transcript needs
+            record["data"] = {}
+        type_, blob = self.serde.dumps_typed(record)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO events (thread_id, seq, type, event, created_at) "
+                "SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ? FROM events WHERE thread_id = ?",
+                (thread_id, type_, blob, time.time(), thread_id),
+            )
+
+    def events(self, thread_id: str) -> list[dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT type, event FROM events WHERE thread_id = ? ORDER BY seq", (thread_id,)
+            ).fetchall()
+        return [self.serde.loads_typed((type_, blob)) for type_, blob in rows]
+
+    def delete(self, thread_id: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events WHERE thread_id = ?", (thread_id,))
+
+    def prune(self, before: float) -> int:
+        """Delete the events of threads whose last event is older than `before` (a timestamp), returns how many threads."""
+        with self._lock, self._conn:
+            threads = [row[0] for row in self._conn.execute(
+                "SELECT thread_id FROM events GROUP BY thread_id HAVING MAX(created_at) < ?", (before,)
+            )]
+            self._conn.executemany("DELETE FROM events WHERE thread_id = ?", [(thread_id,) for thread_id in threads])
+        return len(threads)
+
+
+def new_thread_id() -> str:
+    return uuid.uuid4().hex
+
+
+def thread_config(thread_id: str) -> dict:
+    return {"configurable": {"thread_id": thread_id}}
+
+
+def run_status(app, thread_id: str) -> str:
+    """"new" if the thread has no checkpoint, "interrupted" if nodes are left to run, else "finished"."""
+    if app.checkpointer is None:
+        return "new"
+    snapshot = app.get_state(thread_config(thread_id))
+    if not snapshot.values:
+        return "new"
+    return "interrupted" if snapshot.next else "finished"
+
+
+_UNSET = object()
+_checkpointer: Any = _UNSET
+_event_store: Any = _UNSET
+_lock = threading.Lock()
+
+
+def _setting() -> str:
+    return os.getenv("TRAVEL_PLANNER_CHECKPOINTS", DEFAULT_PATH)
+
+
+def _retention_cutoff() -> Optional[float]:
+    """Timestamp before which threads are deleted, None to keep them."""
+    days = os.getenv("TRAVEL_PLANNER_RETENTION_DAYS", str(DEFAULT_RETENTION_DAYS))
+    return None if days == "off" else time.time() - float(days) * 86400
+
+
+def get_checkpointer() -> Optional[SqliteCheckpointer]:
+    """The process-wide checkpointer, configured from the environment on first use."""
+    global _checkpointer
+    with _lock:
+        if _checkpointer is _UNSET:
+            setting = _setting()
+            _checkpointer = None if setting == "off" else SqliteCheckpointer(
+                _connect(":memory:" if setting == "memory" else setting)
+            )
+            cutoff = _retention_cutoff()
+            if _checkpointer is not None and setting != "memory" and cutoff is not None:
+                _checkpointer.prune(cutoff)
+        return _checkpointer
+
+
+def get_event_store() -> Optional[EventStore]:
+    """The process-wide event store, next to the checkpoints."""
+    global _event_store
+    with _lock:
+        if _event_store is _UNSET:
+            setting = _setting()
+            _event_store = None if setting == "off" else EventStore(":memory:" if setting == "memory" else setting)
+            cutoff = _retention_cutoff()
+            if _event_store is not None and setting != "memory" and cutoff is not None:
+                _event_store.prune(cutoff)
+        return _event_store
+
+
+def delete_thread(thread_id: str):
+    """Delete the checkpoints and events of a thread."""
+    checkpointer, event_store = get_checkpointer(), get_event_store()
+    if checkpointer is not None:
+        checkpointer.delete_thread(thread_id)
+    if event_store is not None:
+        event_store.delete(thread_id)
@@ -0,0 +1,313 @@
+"""Turns the graph's astream_events into incremental progress updates.
+
+This is the event-handling state machine behind the Streamlit UI, the CLI and the HTTP
+server, kept free of any UI code: `ProgressTracker.handle` consumes one event and returns
+only what changed, so a frontend can update one placeholder per message instead of
+re-rendering the transcript.
+
+`stream_progress` runs the graph and yields only the events progress is made of. Most
+of a run's events are the researchers' model tokens and the chain runs of the graphs,
+which nobody renders; the include filters of `EVENT_FILTER` keep them out of the stream
+(and the event store) instead of dropping them in the tracker:
+
+- tool runs (researcher calls, their searches, call_planner),
+- the runs of the graph nodes tagged PROGRESS_TAG (llm_call and planner) with their
+  model calls, for the orchestrator's messages and the plan's tokens,
+- the custom events of CUSTOM_EVENTS.
+"""
+
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Optional
+
+# Tag of the graph nodes whose model output is rendered, see orchestrator.build_orchestrator
+PROGRESS_TAG = "progress"
+
+# Custom events the nodes dispatch for progress
+CUSTOM_EVENTS = ("cached_plan", "warm_start", "prefetch", "budget_exhausted", "research_skipped", "research_reused")
+
+# astream_events include filters of the events ProgressTracker reads. Custom events are
+# matched by name, their run type is their name too
+EVENT_FILTER = {
+    "include_names": list(CUSTOM_EVENTS),
+    "include_types": ["tool"],
+    "include_tags": [PROGRESS_TAG],
+}
+
+
+def extract_content(content: str) -> str:
+    """Extract content from nested message string."""
+    if content.startswith("content='"):
+        start = len("content='")
+        for i, char in enumerate(content[start:], start):
+            if char == "'" and content[i-1] != "\\":
+                return content[start:i].replace("\\n", "\n")
+    return content
+
+
+def extract_ai_text(content) -> str:
+    """Extract text from AI message content (handles both string and list formats)."""
+    if isinstance(content, str):
+        return content
+    elif isinstance(content, list):
+        texts = []
+        for block in content:
+            if isinstance(block, dict) and block.get("type") == "text":
+                texts.append(block.get("text", ""))
+            elif hasattr(block, "text"):
+                texts.append(block.text)
+        return "\n".join(texts)
+    return str(content)
+
+
+@dataclass
+class SubStep:
+    name: str
+    run_id: Optional[str] = None
+    done: bool = False
+    result: Optional[str] = None
+
+
+@dataclass
+class ProgressItem:
+    """One entry of the transcript: an orchestrator message ("ai") or a researcher call ("tool_call")."""
+    type: str
+    content: str
+    id: Optional[str] = None
+    sub_steps: list[SubStep] = field(default_factory=list)
+    result: Optional[str] = None
+    done: bool = False
+
+
+@dataclass
+class Update:
+    """A change to render.
+
+    kind is one of "item" (items[index] was added or changed), "status", "planner_started",
+    "plan_preview" (text is the plan so far) or "plan_ready" (text is the final plan).
+    """
+    kind: str
+    index: Optional[int] = None
+    text: Optional[str] = None
+
+
+class ProgressTracker:
+    """Folds astream_events (version v2) into transcript items, statuses and the plan preview.
+
+    Planner tokens are coalesced: a preview update is emitted at most every
+    `preview_interval` seconds unless `preview_bytes` new characters arrived in between.
+    """
+
+    def __init__(self, preview_interval: float = 0.25, preview_bytes: int = 2048,
+                 clock: Callable[[], float] = time.monotonic):
+        self.preview_interval = preview_interval
+        self.preview_bytes = preview_bytes
+        self.clock = clock
+
+        self.items: list[ProgressItem] = []
+        self.tool_indices: dict[str, int] = {}  # tool_call_id -> index in items
+        self.run_indices: dict[str, int] = {}  # run id of a researcher call -> index in items
+        self.final_plan: Optional[str] = None
+        self.plan_chunks: list[str] = []
+        self._pending_bytes = 0
+        self._last_preview = float("-inf")
+
+    @property
+    def plan_streaming(self) -> bool:
+        return bool(self.plan_chunks)
+
+    def _add_item(self, item: ProgressItem) -> Update:
+        self.items.append(item)
+        if item.id is not None:
+            self.tool_indices[item.id] = len(self.items) - 1
+        return Update("item", index=len(self.items) - 1)
+
+    def research_counts(self) -> tuple[int, int]:
+        tools = [item for item in self.items if item.type == "tool_call"]
+        return sum(1 for item in tools if item.done), len(tools)
+
+    def _tool_index(self, event: dict[str, Any]) -> Optional[int]:
+        """Index of the researcher call an event belongs to, None for other events.
+
+        A researcher call's run carries the orchestrator's tool call id in its metadata,
+        the runs below it (searches) are found by their parent run ids. Researcher calls
+        run concurrently, so their events interleave. Events stored without parent ids
+        fall back to the tool call id the nested runs inherit.
+        """
+        tool_call_id = event.get("metadata", {}).get("orchestrator_tool_call_id")
+        if event.get("name") == "call_researcher":
+            index = self.tool_indices.get(tool_call_id)
+            if index is not None:
+                self.run_indices[event["run_id"]] = index
+            return index
+        parent_ids = event.get("parent_ids")
+        if parent_ids is None:
+            return self.tool_indices.get(tool_call_id)
+        for parent_id in reversed(parent_ids):
+            if parent_id in self.run_indices:
+                return self.run_indices[parent_id]
+        return None
+
+    def handle(self, event: dict[str, Any]) -> list[Update]:
+        event_type = event["event"]
+        event_name = event.get("name", "")
+        metadata = event.get("metadata", {})
+        langgraph_node = metadata.get("langgraph_node", "")
+        tool_index = self._tool_index(event) if event_type in ("on_tool_start", "on_tool_end") else None
+        updates = []
+
+        # Track when orchestrator LLM produces output
+        if event_type == "on_chat_model_end":
+            output = event.get("data", {}).get("output")
+
+            # Capture AI messages from the orchestrator's llm_call node
+            if langgraph_node == "llm_call" and output:
+                if hasattr(output, "content") and output.content:
+                    ai_text = extract_ai_text(output.content)
+                    if ai_text.strip():
+                        updates.append(self._add_item(ProgressItem("ai", ai_text)))
+
+                # Track tool calls - add them to the stream
+                if hasattr(output, "tool_calls") and output.tool_calls:
+                    researcher_calls = [tc for tc in output.tool_calls if tc["name"] == "call_researcher"]
+                    if researcher_calls:
+                        updates.append(Update("status", text=f"🔍 Researching {len(researcher_calls)} queries..."))
+                        for tc in researcher_calls:
+                            question = tc["args"].get("question", "Planning...")
+                            updates.append(self._add_item(ProgressItem("tool_call", question, id=tc["id"])))
+
+            # Check if this is the planner's output
+            if langgraph_node == "planner":
+                if output and hasattr(output, "content") and output.content:
+                    self.final_plan = extract_ai_text(output.content)
+                    updates.append(Update("plan_ready", text=self.final_plan))
+
+        # Handle tool start events
+        elif event_type == "on_tool_start":
+            # Searches of a researcher call
+            if event_name != "call_researcher" and tool_index is not None:
+                query = event.get("data", {}).get("input", {})
+                query_str = query.get("query", str(query)) if isinstance(query, dict) else str(query)
+                self.items[tool_index].sub_steps.append(SubStep(f"🔍 {query_str[:70]}", run_id=event.get("run_id")))
+                updates.append(Update("item", index=tool_index))
+
+        # Handle tool end events
+        elif event_type == "on_tool_end":
+            # Searches of a researcher call
+            if event_name != "call_researcher" and tool_index is not None:
+                run_id = event.get("run_id")
+                for step in self.items[tool_index].sub_steps:
+                    if step.run_id == run_id:
+                        step.done = True
+                        output = event.get("data", {}).get("output", "")
+                        if output:
+                            step.result = str(output)[:300]
+                        break
+                updates.append(Update("item", index=tool_index))
+
+            # Track when call_researcher tool completes
+            elif event_name == "call_researcher" and tool_index is not None:
+                output = event.get("data", {}).get("output", "")
+                content = str(output)
+                if hasattr(output, 'content'):
+                    content = output.content
+                elif content.startswith("content='"):
+                    content = extract_content(content)
+                item = self.items[tool_index]
+                item.result = content
+                item.done = True
+                updates.append(Update("item", index=tool_index))
+                done_count, total = self.research_counts()
+                updates.append(Update("status", text=f"📊 Research: {done_count}/{total} complete"))
+
+            # Track when call_planner tool completes (routing to planner)
+            elif event_name == "call_planner":
+                updates.append(Update("status", text="✨ Creating your personalized travel plan..."))
+                updates.append(Update("planner_started"))
+
+        # Handle chat model streaming for live plan preview
+        elif event_type == "on_chat_model_stream":
+            if langgraph_node == "planner":
+                chunk = event.get("data", {}).get("chunk")
+                if chunk and hasattr(chunk, "content") and chunk.content:
+                    text = extract_ai_text(chunk.content)
+                    self.plan_chunks.append(text)
+                    self._pending_bytes += len(text)
+                    now = self.clock()
+                    if now - self._last_preview >= self.preview_interval or self._pending_bytes >= self.preview_bytes:
+                        updates.extend(self.flush_preview(now))
+
+        # Plans and research reused from the plan cache
+        elif event_type == "on_custom_event":
+            data = event.get("data") or {}
+            if event_name == "cached_plan":
+                self.final_plan = data["plan"]
+                updates.append(Update("status", text="♻️ Reusing the plan of a similar trip"))
+                updates.append(Update("plan_ready", text=self.final_plan))
+            elif event_name == "warm_start":
+                for research in data["research"]:
+                    updates.append(self._add_item(ProgressItem(
+                        "tool_call", research["question"], id=research["id"], result=research["answer"], done=True,
+                    )))
+                updates.append(Update("status", text=f"♻️ Reusing {len(data['research'])} research results of a similar trip"))
+            elif event_name == "prefetch":
+                for research in data["research"]:
+                    updates.append(self._add_item(ProgressItem("tool_call", research["question"], id=research["id"])))
+                updates.append(Update("status", text=f"🔍 Researching {len(data['research'])} standard topics up front..."))
+            elif event_name == "budget_exhausted":
+                updates.append(self._add_item(ProgressItem("ai", data["message"])))
+                updates.append(Update("status", text=f"⏹️ Out of {data['reason']} budget, creating the plan from the research so far..."))
+            elif event_name == "research_skipped":
+                index = self.tool_indices.get(data["tool_call_id"])
+                if index is not None:
+                    self.items[index].result = f"⏹️ Skipped, the {data['reason']} budget of this run is used up"
+                    self.items[index].done = True
+                    updates.append(Update("item", index=index))
+            elif event_name == "research_reused":
+                index = self.tool_indices.get(data["tool_call_id"])
+                if index is not None:
+                    item = self.items[index]
+                    how = "Researched together with" if data["merged"] else "Answered by earlier research on"
+                    item.result = f"♻️ {how}: {data['answered_by']}"
+                    item.done = True
+                    updates.append(Update("item", index=index))
+                    done_count, total = self.research_counts()
+                    updates.append(Update("status", text=f"📊 Research: {done_count}/{total} complete"))
+
+        # Handle chat model start for planner
+        elif event_type == "on_chat_model_start":
+            if langgraph_node == "planner":
+                updates.append(Update("status", text="✨ Creating your personalized travel plan..."))
+                updates.append(Update("planner_started"))
+
+        return updates
+
+    def flush_preview(self, now: Optional[float] = None) -> list[Update]:
+        """Emit the plan preview if tokens arrived since the last one."""
+        if not self._pending_bytes:
+            return []
+        self._pending_bytes = 0
+        self._last_preview = self.clock() if now is None else now
+        return [Update("plan_preview", text="".join(self.plan_chunks))]
+
+
+@dataclass
+class ProgressEvent:
+    """An event of the progress stream and the updates it caused."""
+    event: dict[str, Any]
+    updates: list[Update]
+
+    @property
+    def plan_token(self) -> Optional[str]:
+        """Text of the plan the planner streamed with this event, if any."""
+        if self.event["event"] != "on_chat_model_stream" or self.event["metadata"].get("langgraph_node") != "planner":
+            return None
+        return extract_ai_text(self.event["data"]["chunk"].content)
+
+
+async def stream_progress(app, input, config: Optional[dict] = None,
+                          tracker: Optional[ProgressTracker] = None) -> AsyncIterator[ProgressEvent]:
+    """Runs the compiled orchestrator graph and yields its progress events, folded into `tracker`."""
+    tracker = tracker or ProgressTracker()
+    async for event in app.astream_events(input, config=config, version="v2", **EVENT_FILTER):
+        yield ProgressEvent(event, tracker.handle(event))
@@ -0,0 +1,93 @@
+"""Anthropic prompt caching for the agents' model calls.
+
+Every orchestrator turn resends its tools, system prompt and the whole history, and every
+researcher step its question and search results. Anthropic caches a request's prefix up to
+each block marked with cache_control, and a later request with the same prefix reads it
+at a tenth of the input price (and faster). So the agents lay out their input as:
+
+1. the static instructions, the same for every trip,
+2. the trip context (requirements, earlier research note), fixed for a run,
+3. the history, which only grows,
+
+and `add_breakpoints` marks the system blocks and the last message. The next turn then
+reads everything up to the previous turn's last message from the cache and only the new
+messages are processed. Prefixes below the model's minimum (1024 tokens for Sonnet) are
+not cached, the breakpoints cost nothing there.
+
+Turn off with TRAVEL_PLANNER_PROMPT_CACHE=off, e.g. for models of other providers.
+"""
+
+from typing import Optional
+
+from langchain_core.messages import BaseMessage, SystemMessage
+
+from travel_planner.components import get_components
+
+CACHE_CONTROL = {"type": "ephemeral"}
+
+# Messages looked at from the end for a block that can take the breakpoint
+MAX_LOOKBACK = 3
+
+
+def system_message(*sections: str) -> SystemMessage:
+    """A system message with one text block per section, so each can be a breakpoint."""
+    return SystemMessage(content=[{"type": "text", "text": section} for section in sections if section])
+
+
+def _blocks(content) -> list:
+    return [{"type": "text", "text": content}] if isinstance(content, str) else list(content)
+
+
+def _mark_last(content) -> Optional[list]:
+    """The content with a breakpoint on its last block, None if that block can't take one."""
+    blocks = _blocks(content)
+    if not blocks or not isinstance(blocks[-1], dict) or blocks[-1].get("type") != "text" or not blocks[-1].get("text"):
+        return None
+    return blocks[:-1] + [{**blocks[-1], "cache_control": CACHE_CONTROL}]
+
+
+def add_breakpoints(messages: list[BaseMessage], history: bool = True) -> list[BaseMessage]:
+    """Copies of `messages` with breakpoints on the leading system blocks and, with `history`, the last message.
+
+    At most 2 system blocks and 1 message are marked, Anthropic allows 4 breakpoints.
+    """
+    messages = list(messages)
+    first = 0
+    if messages and isinstance(messages[0], SystemMessage):
+        first = 1
+        blocks = _blocks(messages[0].content)
+        marked = len(blocks) - 2
+        messages[0] = messages[0].model_copy(update={"content": [
+            {**block, "cache_control": CACHE_CONTROL} if i >= marked and isinstance(block, dict) and block.get("text") else block
+            for i, block in enumerate(blocks)
+        ]})
+    if not history:
+        return messages
+    # Text as blocks, marked or not: a message must be sent the same way once its breakpoint
+    # moves on, or the prefix of the next turn doesn't match the cached one
+    for i in range(first, len(messages)):
+        if isinstance(messages[i].content, str) and messages[i].content:
+            messages[i] = messages[i].model_copy(update={"content": _blocks(messages[i].content)})
+    # An empty assistant message (only tool calls) can't take a breakpoint, the one before it can
+    for i in range(len(messages) - 1, max(len(messages) - 1 - MAX_LOOKBACK, first - 1), -1):
+        content = _mark_last(messages[i].content)
+        if content is not None:
+            messages[i] = messages[i].model_copy(update={"content": content})
+            break
+    return messages
+
+
+def model_input(messages: list[BaseMessage], history: bool = True) -> list[BaseMessage]:
+    """`messages` with breakpoints (see add_breakpoints), unless prompt caching is turned off."""
+    return add_breakpoints(messages, history) if get_components().settings.prompt_cache else messages
+
+
+# Cache writes by TTL. langchain_anthropic reports cache_creation as 0 when the response breaks them down
+CACHE_WRITE_DETAILS = ("ephemeral_5m_input_tokens", "ephemeral_1h_input_tokens")
+
+
+def cache_usage(message) -> tuple[int, int]:
+    """(tokens read from the cache, tokens written to it) of a response."""
+    details = (getattr(message, "usage_metadata", None) or {}).get("input_token_details") or {}
+    written = sum(details.get(key) or 0 for key in CACHE_WRITE_DETAILS) or details.get("cache_creation") or 0
+    return details.get("cache_read") or 0, written
@@ -0,0 +1,340 @@
+"""Process-wide rate limiting and scheduling of Anthropic and Tavily calls.
+
+All agents share one `ProviderScheduler` per provider. It enforces token buckets for
+requests per minute and tokens per minute (plus an optional concurrency cap), and decides
+who goes next when calls have to wait:
+
+1. by stage, the planner first, then orchestrator turns, then research, so trips that are
+   nearly done finish before new research starts,
+2. fairly across sessions within a stage (start-time fair queueing), so one session with
+   many parallel researcher calls can't starve the others.
+
+Limits come from the environment, e.g. TRAVEL_PLANNER_ANTHROPIC_RPM,
+TRAVEL_PLANNER_ANTHROPIC_TPM, TRAVEL_PLANNER_ANTHROPIC_CONCURRENCY and
+TRAVEL_PLANNER_TAVILY_RPM. Unset limits don't throttle, but waits are still measured.
+"""
+
+import asyncio
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages.utils import count_tokens_approximately
+from langchain_core.outputs import ChatResult
+
+from travel_planner.instrumentation import Histogram
+
+# Lower goes first
+STAGE_PRIORITY = {"planner": 0, "llm_call": 1, "research": 2}
+
+
+def request_context(metadata: Optional[dict]) -> tuple[str, str]:
+    """(stage, session) of a call, from the metadata of its run."""
+    metadata = metadata or {}
+    if metadata.get("orchestrator_tool_call_id"):
+        stage = "research"
+    elif metadata.get("langgraph_node") == "planner":
+        stage = "planner"
+    else:
+        stage = "llm_call"
+    session = metadata.get("session_id") or metadata.get("thread_id") or "default"
+    return stage, str(session)
+
+
+class TokenBucket:
+    """Refills `per_minute` units per minute, holds at most a minute's worth.
+
+    Taking may overdraw the bucket (e.g. when a response used more tokens than estimated),
+    later takers then wait until it is positive again.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = per_minute
+        self.rate = per_minute / 60
+        self.level = per_minute
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        # Requests larger than the bucket would never fit, let them go once it is full
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount: float, now: float):
+        self._refill(now)
+        self.level -= amount
+
+
+@dataclass(order=True)
+class Ticket:
+    key: tuple
+    stage: str = field(compare=False)
+    session: str = field(compare=False)
+    tokens: int = field(compare=False, default=0)
+    enqueued: float = field(compare=False, default=0.0)
+    granted: Optional[float] = field(compare=False, default=None)
+    # Filled in by the caller after the call, to settle the token estimate
+    used_tokens: Optional[int] = field(compare=False, default=None)
+    # Called (from any thread) when an async waiter's ticket is granted
+    wake: Optional[Callable[[], None]] = field(compare=False, default=None, repr=False)
+
+
+class ProviderScheduler:
+    def __init__(self, name: str, requests_per_minute: Optional[float] = None,
+                 tokens_per_minute: Optional[float] = None, max_concurrency: Optional[int] = None):
+        self.name = name
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.max_concurrency = max_concurrency
+
+        self._waiting: list[Ticket] = []
+        self._in_flight = 0
+        self._seq = itertools.count()
+        self._virtual_time = 0
+        self._session_time: dict[str, int] = {}
+        self._cond = threading.Condition()
+
+        self.max_queue_depth = 0
+        self.granted: dict[str, int] = {}
+        self.wait_seconds: dict[str, Histogram] = {}
+
+    def _enqueue(self, stage: str, session: str, tokens: int) -> Ticket:
+        # Start-time fair queueing: a session's next call is ordered after its previous one,
+        # but never before the current virtual time, so idle sessions don't build up credit
+        start = max(self._session_time.get(session, 0), self._virtual_time) + 1
+        self._session_time[session] = start
+        ticket = Ticket((STAGE_PRIORITY.get(stage, len(STAGE_PRIORITY)), start, next(self._seq)),
+                        stage, session, tokens, time.monotonic())
+        heapq.heappush(self._waiting, ticket)
+        self.max_queue_depth = max(self.max_queue_depth, len(self._waiting))
+        return ticket
+
+    def _grant(self) -> Optional[float]:
+        """Grant waiting tickets in order for as long as the limits allow.
+
+        Returns how long until the bucket lets the next ticket go, None if nothing waits for
+        a refill. Must be called with the lock held.
+        """
+        wait = None
+        granted_any = False
+        while self._waiting:
+            if self.max_concurrency and self._in_flight >= self.max_concurrency:
+                break
+            ticket = self._waiting[0]
+            now = time.monotonic()
+            wait = max(
+                self.requests.wait_time(1, now) if self.requests else 0.0,
+                self.tokens.wait_time(ticket.tokens, now) if self.tokens else 0.0,
+            ) or None
+            if wait:
+                break
+
+            heapq.heappop(self._waiting)
+            if self.requests:
+                self.requests.take(1, now)
+            if self.tokens:
+                self.tokens.take(ticket.tokens, now)
+            self._in_flight += 1
+            self._virtual_time = ticket.key[1]
+            ticket.granted = now
+            self.granted[ticket.stage] = self.granted.get(ticket.stage, 0) + 1
+            self.wait_seconds.setdefault(ticket.stage, Histogram()).observe(now - ticket.enqueued)
+            granted_any = True
+            if ticket.wake is not None:
+                ticket.wake()
+        if granted_any:
+            self._cond.notify_all()
+        return wait
+
+    def acquire(self, stage: str, session: str, tokens: int = 0) -> Ticket:
+        with self._cond:
+            ticket = self._enqueue(stage, session, tokens)
+            while True:
+                wait = self._grant()
+                if ticket.granted is not None:
+                    return ticket
+                # Woken up by grants and releases, or after the refill the head waits for
+                self._cond.wait(timeout=wait)
+
+    async def aacquire(self, stage: str, session: str, tokens: int = 0) -> Ticket:
+        loop = asyncio.get_running_loop()
+        granted = loop.create_future()
+
+        def wake():
+            loop.call_soon_threadsafe(lambda: granted.done() or granted.set_result(None))
+
+        with self._cond:
+            ticket = self._enqueue(stage, session, tokens)
+            ticket.wake = wake
+        try:
+            while True:
+                with self._cond:
+                    wait = self._grant()
+                    if ticket.granted is not None:
+                        return ticket
+                try:
+                    await asyncio.wait_for(asyncio.shield(granted), timeout=wait)
+                except asyncio.TimeoutError:
+                    pass
+        except asyncio.CancelledError:
+            with self._cond:
+                if ticket.granted is None:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._grant()
+                    raise
+            self.release(ticket)
+            raise
+
+    def release(self, ticket: Ticket):
+        with self._cond:
+            self._in_flight -= 1
+            if self.tokens and ticket.used_tokens is not None:
+                # Settle the estimate taken up front against what the call actually used
+                self.tokens.take(ticket.used_tokens - ticket.tokens, time.monotonic())
+            self._grant()
+
+    @contextmanager
+    def slot(self, stage: str, session: str, tokens: int = 0):
+        ticket = self.acquire(stage, session, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    @asynccontextmanager
+    async def aslot(self, stage: str, session: str, tokens: int = 0):
+        ticket = await self.aacquire(stage, session, tokens)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def stats(self) -> dict[str, Any]:
+        with self._cond:
+            return {
+                "queue_depth": len(self._waiting),
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self._in_flight,
+                "granted": dict(self.granted),
+                "wait_seconds": {
+                    stage: {"count": h.count, "sum": h.sum, "mean": h.sum / h.count if h.count else 0.0}
+                    for stage, h in self.wait_seconds.items()
+                },
+            }
+
+
+def _env_number(name: str) -> Optional[float]:
+    value = os.getenv(name)
+    return float(value) if value else None
+
+
+_schedulers: dict[str, ProviderScheduler] = {}
+_schedulers_lock = threading.Lock()
+
+
+def get_scheduler(provider: str) -> ProviderScheduler:
+    """The process-wide scheduler of a provider, configured from the environment on first use."""
+    with _schedulers_lock:
+        if provider not in _schedulers:
+            prefix = f"TRAVEL_PLANNER_{provider.upper()}"
+            concurrency = _env_number(f"{prefix}_CONCURRENCY")
+            _schedulers[provider] = ProviderScheduler(
+                provider,
+                requests_per_minute=_env_number(f"{prefix}_RPM"),
+                tokens_per_minute=_env_number(f"{prefix}_TPM"),
+                max_concurrency=int(concurrency) if concurrency else None,
+            )
+        return _schedulers[provider]
+
+
+def set_scheduler(scheduler: ProviderScheduler):
+    with _schedulers_lock:
+        _schedulers[scheduler.name] = scheduler
+
+
+def render_prometheus() -> str:
+    """Queue depth, in-flight calls and wait times of all schedulers in the Prometheus text format."""
+    lines = []
+    with _schedulers_lock:
+        schedulers = list(_schedulers.values())
+    for scheduler in schedulers:
+        stats = scheduler.stats()
+        provider = f'provider="{scheduler.name}"'
+        lines.append(f"travel_planner_scheduler_queue_depth{{{provider}}} {stats['queue_depth']}")
+        lines.append(f"travel_planner_scheduler_in_flight{{{provider}}} {stats['in_flight']}")
+        for stage, wait in stats["wait_seconds"].items():
+            labels = f'{provider},stage="{stage}"'
+            lines.append(f"travel_planner_scheduler_wait_seconds_sum{{{labels}}} {wait['sum']:g}")
+            lines.append(f"travel_planner_scheduler_wait_seconds_count{{{labels}}} {wait['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def _usage_tokens(message) -> Optional[int]:
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    # Anthropic doesn't count prompt-cache reads against the input tokens per minute
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    return usage["input_tokens"] - cache_read + usage["output_tokens"]
+
+
+class ScheduledChatModel(BaseChatModel):
+    """Chat model wrapper that takes a slot of the provider's scheduler for every call."""
+
+    model: BaseChatModel
+    provider: str = "anthropic"
+
+    @property
+    def _llm_type(self) -> str:
+        return self.model._llm_type
+
+    @property
+    def _identifying_params(self) -> dict[str, Any]:
+        return self.model._identifying_params
+
+    def _get_ls_params(self, stop=None, **kwargs):
+        return self.model._get_ls_params(stop=stop, **kwargs)
+
+    def bind_tools(self, tools, **kwargs):
+        # Let the wrapped model format the tools, but keep calls going through the wrapper
+        bound = self.model.bind_tools(tools, **kwargs)
+        return self.bind(**getattr(bound, "kwargs", {}))
+
+    def _slot_args(self, messages, run_manager) -> tuple[str, str, int]:
+        stage, session = request_context(run_manager.metadata if run_manager else None)
+        return stage, session, count_tokens_approximately(messages)
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        with get_scheduler(self.provider).slot(*self._slot_args(messages, run_manager)) as ticket:
+            result = self.model._generate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            ticket.used_tokens = _usage_tokens(result.generations[0].message)
+        return result
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        async with get_scheduler(self.provider).aslot(*self._slot_args(messages, run_manager)) as ticket:
+            result = await self.model._agenerate(messages, stop=stop, run_manager=run_manager, **kwargs)
+            ticket.used_tokens = _usage_tokens(result.generations[0].message)
+        return result
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        with get_scheduler(self.provider).slot(*self._slot_args(messages, run_manager)) as ticket:
+            for chunk in self.model._stream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                ticket.used_tokens = _usage_tokens(chunk.message) or ticket.used_tokens
+                yield chunk
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        async with get_scheduler(self.provider).aslot(*self._slot_args(messages, run_manager)) as ticket:
+            async for chunk in self.model._astream(messages, stop=stop, run_manager=run_manager, **kwargs):
+                ticket.used_tokens = _usage_tokens(chunk.message) or ticket.used_tokens
+                yield chunk
@@ -0,0 +1,270 @@
+"""HTTP API for backend integrations: plans as jobs, progress as Server-Sent Events.
+
+    POST   /plans              trip fields as JSON -> 202 {"id", "status", "events"}, 422 {"error"}
+    GET    /plans/{id}         status, trip and (once done) the plan
+    GET    /plans/{id}/events  SSE stream of the job's progress, from the start
+    DELETE /plans/{id}         cancel a running job
+    DELETE /plans/cache/{destination}  drop the cached plans of a destination -> {"removed"}
+    GET    /metrics            run and scheduler metrics in the Prometheus text format
+
+Progress events are the ProgressTracker updates the Streamlit UI renders: transcript
+items (orchestrator reasoning, researcher calls with their searches), statuses, and the
+plan as it is written ("plan_delta" events with the new text). Every job runs as a task
+in the server's event loop on the shared compiled graph, so the model and search
+clients and their connection pools are shared by all requests.
+
+    travel-planner serve --port 8000
+"""
+
+import asyncio
+import contextlib
+import json
+from datetime import date
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+
+from langchain_core.messages import HumanMessage
+from langfuse.langchain import CallbackHandler
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from travel_planner import scheduler
+from travel_planner.agents.orchestrator import get_orchestrator
+from travel_planner.batch import TRIP_FIELDS
+from travel_planner.budget import budget_config
+from travel_planner.cache import get_plan_cache
+from travel_planner.instrumentation import RunMetrics, registry
+from travel_planner.persistence import RECORDED_EVENTS, delete_thread, get_event_store, new_thread_id, thread_config
+from travel_planner.progress import ProgressTracker, Update, stream_progress
+
+# Finished jobs kept in memory for status requests and late subscribers
+MAX_FINISHED_JOBS = 1000
+
+
+@dataclass
+class Job:
+    id: str
+    trip: dict
+    status: str = "running"  # "running", "done", "failed" or "cancelled"
+    plan: Optional[str] = None
+    error: Optional[str] = None
+    events: list = field(default_factory=list)
+    task: Optional[asyncio.Task] = None
+    changed: asyncio.Condition = field(default_factory=asyncio.Condition)
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "running"
+
+    async def publish(self, kind: str, **data):
+        async with self.changed:
+            self.events.append({"kind": kind, **data})
+            self.changed.notify_all()
+
+    def as_dict(self) -> dict:
+        return {"id": self.id, "status": self.status, "trip": self.trip, "plan": self.plan, "error": self.error}
+
+
+def _event_data(tracker: ProgressTracker, update: Update, sent_plan: int) -> dict:
+    if update.kind == "item":
+        return {"index": update.index, "item": asdict(tracker.items[update.index])}
+    if update.kind == "plan_preview":
+        return {"text": update.text[sent_plan:]}
+    return {"text": update.text} if update.text is not None else {}
+
+
+async def run_job(job: Job, session_id: str):
+    app = get_orchestrator()
+    event_store = get_event_store()
+    tracker = ProgressTracker()
+    sent_plan = 0
+    config = budget_config({
+        **thread_config(job.id),
+        "callbacks": [CallbackHandler(), RunMetrics()],
+        "metadata": {"session_id": session_id},
+        "run_name": f"plan {job.id}",
+    })
+    try:
+        state = {"messages": [HumanMessage(content="Plan my trip")], **job.trip}
+        async for progress in stream_progress(app, state, config, tracker):
+            if event_store is not None and progress.event["event"] in RECORDED_EVENTS:
+                # A SQLite insert and commit, off the loop that serves every other job
+                await asyncio.to_thread(event_store.append, job.id, progress.event)
+            for update in progress.updates:
+                data = _event_data(tracker, update, sent_plan)
+                if update.kind == "plan_preview":
+                    sent_plan = len(update.text)
+                    await job.publish("plan_delta", **data)
+                else:
+                    await job.publish(update.kind, **data)
+        job.plan = tracker.final_plan
+        job.status = "done"
+    except asyncio.CancelledError:
+        job.status = "cancelled"
+    except Exception as error:
+        job.status = "failed"
+        job.error = f"{type(error).__name__}: {error}"
+    await job.publish("end", status=job.status, error=job.error)
+
+
+class JobRegistry:
+    def __init__(self):
+        self.jobs: dict[str, Job] = {}
+
+    def start(self, trip: dict, session_id: Optional[str] = None) -> Job:
+        job = Job(new_thread_id(), trip)
+        self.jobs[job.id] = job
+        job.task = asyncio.create_task(run_job(job, session_id or job.id))
+        self._evict()
+        return job
+
+    def _evict(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        evicted = finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]
+        for job_id in evicted:
+            del self.jobs[job_id]
+            # Nobody can ask for the job anymore, its checkpoints and events go too (off the loop)
+            asyncio.get_running_loop().run_in_executor(None, delete_thread, job_id)
+
+    async def cancel(self, job: Job):
+        if job.task is not None and not job.task.done():
+            job.task.cancel()
+            await asyncio.gather(job.task, return_exceptions=True)
+
+
+jobs = JobRegistry()
+
+
+def _format_sse(index: int, event: dict) -> str:
+    data = {k: v for k, v in event.items() if k != "kind"}
+    return f"id: {index}\nevent: {event['kind']}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def job_events(job: Job, start: int = 0):
+    index = start
+    while True:
+        async with job.changed:
+            await job.changed.wait_for(lambda: index < len(job.events))
+            pending = job.events[index:]
+        for event in pending:
+            yield _format_sse(index, event)
+            index += 1
+            if event["kind"] == "end":
+                return
+
+
+def _get_job(request: Request) -> Optional[Job]:
+    return jobs.jobs.get(request.path_params["job_id"])
+
+
+def _not_found() -> JSONResponse:
+    return JSONResponse({"error": "unknown job"}, status_code=404)
+
+
+def trip_error(body: dict) -> Optional[str]:
+    """Why the trip fields of a request can't be planned, None if they can."""
+    if not body.get("destination_city"):
+        return "destination_city is required"
+    for key in ("home_city", "destination_city", "additional_info"):
+        if body.get(key) is not None and not isinstance(body[key], str):
+            return f"{key} must be a string"
+    budget = body.get("budget")
+    if budget is not None and (isinstance(budget, bool) or not isinstance(budget, (int, float))):
+        return "budget must be a number"
+    dates = {}
+    for key in ("start_date", "end_date"):
+        if body.get(key) is None:
+            continue
+        try:
+            dates[key] = date.fromisoformat(body[key])
+        except (TypeError, ValueError):
+            return f"{key} must be a date (YYYY-MM-DD)"
+    if len(dates) == 2 and dates["end_date"] < dates["start_date"]:
+        return "end_date must not be before start_date"
+    return None
+
+
+async def create_plan(request: Request) -> JSONResponse:
+    try:
+        body = await request.json()
+    except json.JSONDecodeError:
+        return JSONResponse({"error": "body must be JSON"}, status_code=400)
+    if not isinstance(body, dict):
+        return JSONResponse({"error": "body must be a JSON object"}, status_code=422)
+    error = trip_error(body)
+    if error is not None:
+        return JSONResponse({"error": error}, status_code=422)
+    trip = {key: body.get(key) for key in TRIP_FIELDS}
+    job = jobs.start(trip, session_id=body.get("session_id"))
+    return JSONResponse(
+        {"id": job.id, "status": job.status, "events": str(request.url_for("plan_events", job_id=job.id))},
+        status_code=202,
+    )
+
+
+async def get_plan(request: Request) -> JSONResponse:
+    job = _get_job(request)
+    return JSONResponse(job.as_dict()) if job else _not_found()
+
+
+async def plan_events(request: Request):
+    job = _get_job(request)
+    if job is None:
+        return _not_found()
+    # Reconnecting clients continue after the last event they saw
+    last_event_id = request.headers.get("last-event-id")
+    start = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    return StreamingResponse(
+        job_events(job, start),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def cancel_plan(request: Request) -> JSONResponse:
+    job = _get_job(request)
+    if job is None:
+        return _not_found()
+    await jobs.cancel(job)
+    return JSONResponse(job.as_dict())
+
+
+async def invalidate_plans(request: Request) -> JSONResponse:
+    cache = get_plan_cache()
+    if cache is None:
+        return JSONResponse({"error": "the plan cache is turned off"}, status_code=404)
+    return JSONResponse({"removed": cache.invalidate(request.path_params["destination"])})
+
+
+async def metrics(request: Request) -> PlainTextResponse:
+    return PlainTextResponse(registry.render_prometheus() + scheduler.render_prometheus())
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: Starlette):
+    yield
+    # Running jobs stay resumable from their last checkpoint
+    await asyncio.gather(*(jobs.cancel(job) for job in list(jobs.jobs.values())))
+
+
+app = Starlette(
+    routes=[
+        Route("/plans", create_plan, methods=["POST"]),
+        Route("/plans/cache/{destination}", invalidate_plans, methods=["DELETE"]),
+        Route("/plans/{job_id}", get_plan, methods=["GET"]),
+        Route("/plans/{job_id}", cancel_plan, methods=["DELETE"]),
+        Route("/plans/{job_id}/events", plan_events, methods=["GET"], name="plan_events"),
+        Route("/metrics", metrics, methods=["GET"]),
+    ],
+    lifespan=lifespan,
+)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8000):
+    import uvicorn
+
+    # Compile the graph before the first request
+    get_orchestrator()
+    uvicorn.run(app, host=host, port=port)